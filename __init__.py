@@ -1,11 +1,8 @@
-import sympy as sp
-import numpy as np
-from sympy import symbols, Symbol, Eq, evaluate, sympify, parse_expr, init_printing, Rational, solve, simplify, lambdify
-from sympy import latex, print_latex, multiline_latex
-
 # for: reload(eeMath)
 from importlib import reload
 
+from os import environ as _environ
+
 # eeMathLib_path='/Users/jeffreyruss/Desktop/EE 2023/ python_math (for circuits)'
 # # The above must change if the location if the original of this file (not a
 # # hardlink to it but the one in the same location as the eeMathLib/ dir) changes location
@@ -19,25 +16,192 @@ from importlib import reload
 # __all__ = [ 'helpers', 'fs', 'eeFundamentals', 'opamp', 'freq_and_time' ]
 
 
-from eeMath.discrete import *
-from eeMath.eeFundamentals import *
-# from eeMath.eeOperators import *
-from eeMath.eeSymbols import *
-# from eeMath.filters import *
-from eeMath.general_helpers import *
-from eeMath.graphing import *
-from eeMath.math_helpers import *
-# from eeMath.components import *
-from eeMath.resistance import *
-from eeMath.thermal import *
-from eeMath.freq_and_time import *
-# from eeMath.diode import *
-from eeMath.bjt import *
-from eeMath.opamp import *
-from eeMath.ota  import *
-# from eeMath.shell_helpers import *
-from eeMath.units import *
-# from eeMath.VToI import *
+########## LAZY LOADING ###########################################################################
+
+# Lazy mode is enabled by setting EEMATH_LAZY=1 in the environment before the first `import eeMath`.
+# In lazy mode nothing below is imported up front: the module-level __getattr__ looks the requested
+# name up in _exports and imports only the submodule that defines it, so e.g. `eeMath.parseNum` never
+# builds the equations in eeFundamentals, opamp, ota, etc. (and never imports sympy).
+# NOTE: Every public name a submodule defines must be listed here for it to be reachable in lazy mode.
+#       Names are NFKC normalized by python so µA, µV and µs are listed with the greek mu (μ).
+
+# names the package itself imports from sympy (sp and np are the modules themselves)
+_sympy_exports = (
+  'symbols', 'Symbol', 'Eq', 'evaluate', 'sympify', 'parse_expr', 'init_printing', 'Rational', 'solve',
+  'simplify', 'lambdify', 'latex', 'print_latex', 'multiline_latex'
+)
+_module_aliases = { 'sp': 'sympy', 'np': 'numpy' }
+
+# submodule: names defined by that submodule (in the same order as the eager star imports)
+_exports = {
+  'discrete': (
+    'zipUnzip', 'unweave', 'iterUnweave', 'lens', 'lensMinMax', 'weave', 'iterWeave', 'yValsToCoords',
+    'interpCoords',
+    'bitflipUInt', 'bitmaskList', 'bitmaskMatrix', 'nBitBin'
+  ),
+  'eeFundamentals': (
+    'ohmslaw_V_eq', 'ohmslaw_I_eq', 'ohmslaw_R_eq', 'vdiv_out_eq', 'vdiv_R_IN_eq', 'vdiv_v_in_eq',
+    'vdiv_R_GND_eq', 'vdiv_eq_of', 'mkfuncVDivSolver', 'bestDivider', 'voltageAtResistorJunction', 'vRJunct', 'prepareJunction', 'vDivExpr'
+  ),
+  'eeSymbols': (
+    'SymbRegistry', 'symbs', 'symbsCacheInfo', 'getSymb', 'varnameToLaTeX', 'real_nonneg', 'real_finite', 'n_bits', 'n_bit', 'n_bin',
+    'p_cnt', 'v_D', 'i_D', 'n_D', 't_Kelvin', 't_Celsius', 't_Fahr', 'V_T', 'alpha', 'beta', 'a_F',
+    'I_B', 'I_C', 'I_E', 'V_BE', 'V_CE', 'V_CB', 'i_B', 'i_C', 'i_E', 'v_BE', 'v_CE', 'v_CB',
+    'I_ES', 'I_S', 'I_S0', 'beta_0', 'V_A', 'R_B', 'R_C', 'R_E', 'V_CC', 'V_BB', 'v_RB', 'v_RC', 'v_RE', 'v_B1',
+    'v_B2', 'v_diff', 'i_tail', 'i_Ep', 'i_Em', 'i_Bp', 'i_Bm', 'i_Cp', 'i_Cm', 'g_m', 'V', 'I',
+    'R', 'P_watts', 't', 't_s', 't_ms', 't_us', 't_ns', 't_ps', 'vps', 'v_0', 'v_t', 'v_now',
+    'v_then', 'v_C', 'v_R', 'i_R', 'R_in', 'R_out', 'R_A', 'R_X', 'R_F', 'R_REF', 'R_pREF',
+    'R_nREF', 'r_in', 'r_out', 'r_x', 'R1', 'R2', 'R3', 'R4', 'R5', 'R6', 'Rll', 'R_IN', 'R_GND',
+    'R_pull', 'C', 'C1', 'C2', 'C3', 'C4', 'C5', 'D', 'D1', 'D2', 'D3', 'D4', 'V_REF', 'V_pREF',
+    'V_nREF', 'V_pull', 'tau1', 'n_tau', 'v_offset', 'v_gain', 'v_p_gain', 'v_m_gain', 'v_p', 'v_m',
+    'i_abc', 'i_out', 'v_out', 'v_in', 'v_mIn', 'v_pIn', 'R_v_m', 'R_fb', 'R_nfb', 'R_pfb', 'R_v_p',
+    'n_midi', 'f_Hz', 'v_cin', 'i_cout'
+  ),
+  'general_helpers': (
+    'func_attr', 'printToStr', 'printlToStr', 'strReplaceEach', 'iSeq', 'ISeq', 'MapISeqsToISeqs',
+    'flatten', 'partitionByContiguousInt', 'missingInts', 'dupElement', 'sameElements',
+    'setOperation', 'setDiff', 'setIntersect', 'setUnion', 'setSymmDiff', 'stringifyEach',
+    'stringifyJoin', 'appendAny', 'prependAny', 'tuplesToDict', 'ppObj', 'showdef', 'instanceof',
+    'classof', 'zerothDictKey', 'zerothLeafDictKey', 'fullnameFromClass', 'nameFromClass',
+    'classFromName', 'dummyThruFunc', 'baseClassChain', 'attrs', 'calcGainAndOffset',
+    'returnOrShow', 'sympy_types', 'sympy_Eq_attrs', 'sympy_core_types', 'sympy_modules',
+    'sympy_plotting'
+  ),
+  'graphing': (
+    'splt', 'plot', 'plt'
+  ),
+  'math_helpers': (
+    'subs', 'equalExprs', 'cachedSolve', 'solveCacheInfo', 'solveFor', 'solveSys', 'sweepGrid', 'sweepSolve', 'newtonSolve', 'evalF', 'spPrint', 'spStr', 'floatDecimalPlaces',
+    'lambdifier', 'lambdifierCacheInfo', 'ppMode', 'pp', 'repetendLen', 'repetendStr', 'overline', 'divToUnicode'
+  ),
+  'resistance': (
+    'parallelR', 'llR', 'get_Rll_eq', 'parallelRPermutations', 'parallelRPermutationsIter', 'e_series',
+    'e_series_decades', 'eSeriesIndex', 'bracketEValue', 'nearestEValue'
+  ),
+  'thermal': (
+    'kelvin_of_celsius_expr', 'kelvin_of_fahr_expr', 'tempConvert', 'VT_68F', 'VT_20C', 'VT_74F',
+    'VT_23C', 'VT_spice', 'VT_falstad', 'VT_approx', 'VT2_approx', 'VT_90F', 'VT_32C', 'VT_93F',
+    'VT_34C', 'VTofTemp', 'tempOfVT', 'mVofVT', 'factorOfVT', 'VTofFactor'
+  ),
+  'freq_and_time': (
+    'periodOfHz', 'sOfHz', 'hzOfPeriod', 'hzOfS', 'msOfHz', 'tau1_of_RC_eq', 'p_cnt_after_n_tau_eq',
+    'n_tau_of_p_cnt_eq', 'valOfRCWithTau', 'f_Hz_of_RC_at_n_tau_eq', 'valOfRCWithHz', 'hzOfRC',
+    'infoOnRC', 'pwlSource', 'rcTransient', 'frequencyResponse', 'f_Hz_of_n_midi_eq', 'n_midi_of_f_Hz_eq', 'semitone_up_ratio',
+    'semitone_down_ratio', 'midi_notes', 'midiHzTable', 'hzOfMidi', 'midiOfHz', 'periodOfMidi',
+    'nearestMidi'
+  ),
+  'bjt': (
+    'bjt_alpha_equalities', 'bjt_beta_equalities', 'bjt_i_E_equalities', 'bjt_i_C_equalities',
+    'bjt_i_B_equalities', 'bjt_I_S_equalities', 'bjt_diffpair_i_E_eq', 'bjt_diffpair_i_Ep_eq',
+    'bjt_diffpair_i_Em_eq', 'bjt_active_i_C_expr', 'bjt_active_i_B_expr', 'bjt_stage_residuals',
+    'bjtOperatingPoint'
+  ),
+  'diode': (
+    'i_D_shockley_eq', 'i_D_4148_shockley_eq', 'diode_series_R_residual', 'diodeOperatingPoint'
+  ),
+  'opamp': (
+    'opamp_nfb_v_out_expr', 'opamp_nfb_v_out_eq', 'opamp_v_p_eq_v_m', 'opamp_noninv_v_gain_eq',
+    'opamp_noninv_v_offset_eq', 'opamp_noninv_v_out_of_offset_gain_eq', 'opamp_noninv_v_out_eq',
+    'opampNoninvGainAndOffset', 'opampNfbBuilder', 'opamp_4R_v_p_gain_eq', 'opamp_4R_v_m_gain_eq',
+    'opamp_4R_v_out_eq', 'opamp_4R_V_pREF_v_out_eq', 'OpampConfig'
+  ),
+  'ota': (
+    'ota_gm', 'ideal_ota_vcr_R_X_eq', 'ideal_ota_i_out', 'ideal_ota_v_out', 'ideal_ota_i_out_eq',
+    'ideal_ota_kelvin_i_out_eq', 'ideal_ota_celsius_i_out_eq', 'ideal_ota_fahr_i_out_eq',
+    'sauer_ota_i_out', 'sauer_ota_i_out_eq', 'real_ota_i_out', 'real_ota_v_out',
+    'real_ota_i_out_eq', 'real_ota_kelvin_i_out', 'real_ota_celsius_i_out', 'real_ota_fahr_i_out',
+    'discrete_ota_eq', 'discreteOtaExpr', 'ota_models', 'otaSweep'
+  ),
+  'units': (
+    'prefix_order', 'metric_prefixes', 'metric_prefix_exponents', 'getUnits', 'unit', 'getUnit', 'pA', 'nA', 'uA', 'mA', 'μA',
+    'pF', 'nF', 'uF', 'mΩ', 'Ω', 'kΩ', 'MΩ', 'uV', 'mV', 'μV', 'us', 'ms', 'μs',
+    'generateMetricPrefixesFor', 'parseNum', 'parseMany'
+  ),
+  'consts': (
+    'consts',
+  ),
+  'eq_cache': (
+    'cachedEqs', 'buildEqCache', 'eqCacheFile'
+  ),
+  'tolerance': (
+    'mc_distribution_kinds', 'monteCarlo'
+  ),
+  'mna': (
+    'mna_ground_names', 'mna_element_types', 'MnaCircuit'
+  ),
+}
+
+_load_times = {} # submodule: seconds spent importing it (and whatever it imports) on first access
+
+def loadTimes():
+  '''returns a dict of each submodule loaded lazily so far mapped to the seconds its import took.
+  Only meaningful in lazy mode (EEMATH_LAZY=1): in eager mode everything is loaded at import time.'''
+  return dict(_load_times)
+
+
+if _environ.get('EEMATH_LAZY', '0') in ('', '0'):
+  import sympy as sp
+  import numpy as np
+  from sympy import symbols, Symbol, Eq, evaluate, sympify, parse_expr, init_printing, Rational, solve, simplify, lambdify
+  from sympy import latex, print_latex, multiline_latex
+
+  from eeMath.discrete import *
+  from eeMath.eeFundamentals import *
+  # from eeMath.eeOperators import *
+  from eeMath.eeSymbols import *
+  # from eeMath.filters import *
+  from eeMath.general_helpers import *
+  from eeMath.graphing import *
+  from eeMath.math_helpers import *
+  # from eeMath.components import *
+  from eeMath.resistance import *
+  from eeMath.thermal import *
+  from eeMath.freq_and_time import *
+  from eeMath.diode import *
+  from eeMath.bjt import *
+  from eeMath.opamp import *
+  from eeMath.ota  import *
+  # from eeMath.shell_helpers import *
+  from eeMath.units import *
+  # from eeMath.VToI import *
+  from eeMath.tolerance import *
+  from eeMath.mna import *
+  from eeMath.eq_cache import cachedEqs, buildEqCache, eqCacheFile
+
+else:
+  from importlib import import_module as _import_module
+  from sys import modules as _sys_modules
+  from time import perf_counter as _perf_counter
+
+  _module_of_export = {name: submodule for submodule, names in _exports.items() for name in names}
+  _module_of_export.update({name: 'sympy' for name in _sympy_exports})
+
+  # submodule names that are also exported names (e.g. consts): importing the submodule binds the
+  # module object to the package, so that binding is dropped to let __getattr__ return the export.
+  _shadowed = _exports.keys() & _module_of_export.keys()
+
+  def _loadModule(fullname):
+    if fullname in _sys_modules: return _sys_modules[fullname]
+    start = _perf_counter()
+    module = _import_module(fullname)
+    _load_times[fullname] = _perf_counter() - start
+    for name in _shadowed:
+      if globals().get(name) is _sys_modules.get(f'{__name__}.{name}'): globals().pop(name, None)
+    return module
+
+  def __getattr__(name):
+    if name in _module_aliases: value = _loadModule(_module_aliases[name])
+    elif name in _module_of_export:
+      submodule = _module_of_export[name]
+      value = getattr(_loadModule(submodule if submodule == 'sympy' else f'{__name__}.{submodule}'), name)
+    elif name in _exports: return _loadModule(f'{__name__}.{name}')
+    else: raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value # cache it so __getattr__ is not called again for this name
+    return value
+
+  def __dir__(): return sorted(set(globals()) | set(_module_of_export) | set(_module_aliases))
+
+  __all__ = [*_module_aliases, *_module_of_export, 'reload', 'Path', 'loadTimes']
 
 
 from pathlib import Path
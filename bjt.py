@@ -1,9 +1,10 @@
 from sympy import Eq, evaluate, exp
 
-from eeMath.math_helpers import lambdifier
+from eeMath.math_helpers import lambdifier, newtonSolve
 from eeMath.thermal import *
 from eeMath.eeSymbols import alpha, beta, beta_0, i_B, i_C, i_E, I_S, I_S0, V_T, v_BE, v_CE, v_CB, V_A
 from eeMath.eeSymbols import v_diff, v_B1, v_B2, v_p, v_m, i_Ep, i_Em, i_tail
+from eeMath.eeSymbols import R_B, R_C, R_E, V_CC, V_BB
 
 
 # BJT gain characteristics
@@ -50,6 +51,51 @@ with evaluate(False):
   bjt_diffpair_i_Em_eq = Eq( i_Em, i_tail / (1 + exp((v_p-v_m)/V_T)) )
 
 
-
-
-
+# BJT stage operating point: an NPN with R_B from V_BB (the Thevenin equivalent of a divider bias) to its
+# base, R_C from V_CC to its collector and R_E from its emitter to ground, in the active mode with the
+# Early effect (i_C = I_S*exp(v_BE/V_T) with I_S = I_S0*(1 + v_CE/V_A), and i_B = i_C/beta with
+# beta = beta_0*(1 + v_CE/V_A)), as residuals of the base and collector loops in v_BE and v_CE
+with evaluate(False):
+  bjt_active_i_C_expr = I_S0 * (1 + v_CE / V_A) * exp(v_BE / V_T)
+  bjt_active_i_B_expr = bjt_active_i_C_expr / (beta_0 * (1 + v_CE / V_A))
+  bjt_stage_residuals = (
+    V_BB - R_B * bjt_active_i_B_expr - v_BE - R_E * (bjt_active_i_C_expr + bjt_active_i_B_expr),
+    V_CC - R_C * bjt_active_i_C_expr - v_CE - R_E * (bjt_active_i_C_expr + bjt_active_i_B_expr),
+  )
+
+def bjtOperatingPoint(V_CC_val, V_BB_val, R_B_val, R_C_val, R_E_val=0, I_S0_val=1e-14, beta_0_val=100, V_A_val=100,
+                      V_T_val=None, max_step=0.1, **newton_kwargs):
+  '''bjtOperatingPoint(V_CC_val, V_BB_val, R_B_val, R_C_val, R_E_val=0, I_S0_val=1e-14, beta_0_val=100, V_A_val=100,
+                       V_T_val=None, max_step=0.1, **newton_kwargs)
+  returns a dict of 'v_BE', 'v_CE', 'i_C', 'i_B', 'i_E', 'saturated', 'converged' and 'iterations' of the
+  stage of bjt_stage_residuals (see the comment above them), solved by newtonSolve with each step of v_BE
+  limited to max_step volts. V_T_val defaults to VTofTemp(27). Any of the values can be arrays (broadcast
+  together) to bias many stages at once. The model is active mode only, so where v_CE is below 0.2V the
+  stage is actually saturated and the solution is meaningless: 'saturated' is True there, and 'converged'
+  is False. newton_kwargs are passed to newtonSolve.
+  Example (a divider bias of 10k/2.2k from 12V, as V_BB = 12*2.2/12.2 through R_B = 10k||2.2k):
+    bjtOperatingPoint(12, 12*2.2/12.2, parallelR(10e3, 2.2e3), '4.7k', '1k')'''
+  import numpy as np
+  from eeMath.units import parseNum, parseMany
+  value = lambda val: parseMany(val) if np.ndim(val) else float(parseNum(val))
+  vals = { V_CC: V_CC_val, V_BB: V_BB_val, R_B: R_B_val, R_C: R_C_val, R_E: R_E_val, I_S0: I_S0_val,
+           beta_0: beta_0_val, V_A: V_A_val, V_T: VTofTemp(27) if V_T_val is None else V_T_val }
+  vals = { symb: value(val) for symb, val in vals.items() }
+  # start from the currents with a v_BE of 0.65V (and the v_BE of that i_C)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    i_B_guess = np.maximum(vals[V_BB] - 0.65, 0) / (vals[R_B] + (vals[beta_0] + 1) * vals[R_E])
+    i_C_guess = vals[beta_0] * i_B_guess
+    v_CE_guess = np.clip(vals[V_CC] - i_C_guess * vals[R_C] - (i_C_guess + i_B_guess) * vals[R_E], 0.2, None)
+    v_BE_guess = np.where(i_C_guess > 0, vals[V_T] * np.log(i_C_guess / vals[I_S0]), np.minimum(vals[V_BB], 0.5))
+  sol = newtonSolve(bjt_stage_residuals, [v_BE, v_CE], {v_BE: v_BE_guess, v_CE: v_CE_guess}, vals,
+                    max_step={v_BE: max_step}, **newton_kwargs)
+  early = 1 + sol[v_CE] / vals[V_A]
+  i_C_val = vals[I_S0] * early * np.exp(sol[v_BE] / vals[V_T])
+  i_B_val = i_C_val / (vals[beta_0] * early)
+  saturated = sol[v_CE] < 0.2
+  op = { 'v_BE': sol[v_BE], 'v_CE': sol[v_CE], 'i_C': i_C_val, 'i_B': i_B_val, 'i_E': i_C_val + i_B_val,
+         'saturated': saturated, 'converged': sol['converged'] & ~saturated, 'iterations': sol['iterations'] }
+  if not np.ndim(saturated):
+    op.update({ name: float(op[name]) for name in ('i_C', 'i_B', 'i_E') })
+    op.update(saturated=bool(saturated), converged=bool(op['converged']))
+  return op
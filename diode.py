@@ -2,15 +2,40 @@
 from sympy import Eq, evaluate, exp
 
 # from eeMath.math_helpers import lambdifier
+from eeMath.math_helpers import newtonSolve
 from eeMath.thermal import *
-from eeMath.eeSymbols import v_D, i_D, n_D, I_S, I_S0
+from eeMath.eeSymbols import v_D, i_D, n_D, I_S, I_S0, V, R
 
 
 with evaluate(False):
-  i_D_shockley_eq = Eq( i_D, I_S * ( (v_D)/(exp(n_D * V_T)) - 1 ) )
+  i_D_shockley_eq = Eq( i_D, I_S * ( exp(v_D / (n_D * V_T)) - 1 ) )
   i_D_4148_shockley_eq = Eq( i_D, i_D_shockley_eq.rhs.subs({I_S: 4.35e-09, n_D: 1.906}) )
-  
 
+  # KVL of a source V through a series R into the diode (zero at the operating point)
+  diode_series_R_residual = V - R * i_D_shockley_eq.rhs - v_D
 
 
-# Z_Z zener Impedance	(typically )
\ No newline at end of file
+def diodeOperatingPoint(V_val, R_val, I_S_val=4.35e-09, n_D_val=1.906, V_T_val=None, max_step=0.1, **newton_kwargs):
+  '''diodeOperatingPoint(V_val, R_val, I_S_val=4.35e-09, n_D_val=1.906, V_T_val=None, max_step=0.1, **newton_kwargs)
+  returns a dict of 'v_D', 'i_D', 'converged' and 'iterations' for a diode (a 1N4148 by default) fed from
+  V_val through R_val, solved by newtonSolve from diode_series_R_residual, with each step of v_D limited
+  to max_step volts. V_T_val defaults to VTofTemp(27). Any of the values can be arrays (broadcast
+  together) to solve many operating points at once. newton_kwargs are passed to newtonSolve.
+  Example:
+    diodeOperatingPoint(np.linspace(0, 12, 1000), '1k')['i_D']'''
+  import numpy as np
+  from eeMath.units import parseNum, parseMany
+  value = lambda val: parseMany(val) if np.ndim(val) else float(parseNum(val))
+  V_val, R_val, I_S_val, n_D_val = (value(val) for val in (V_val, R_val, I_S_val, n_D_val))
+  V_T_val = VTofTemp(27) if V_T_val is None else value(V_T_val)
+  # start from the diode voltage if all of V_val was across R_val (or all of it across the diode, in reverse)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    guess = np.where(V_val > 0, np.minimum(V_val, n_D_val * V_T_val * np.log1p(np.maximum(V_val, 0) / (R_val * I_S_val))), V_val)
+  sol = newtonSolve([diode_series_R_residual], [v_D], {v_D: guess},
+                    {V: V_val, R: R_val, I_S: I_S_val, n_D: n_D_val, V_T: V_T_val}, max_step={v_D: max_step}, **newton_kwargs)
+  i_D_val = I_S_val * np.expm1(sol[v_D] / (n_D_val * V_T_val))
+  return { 'v_D': sol[v_D], 'i_D': i_D_val if np.ndim(i_D_val) else float(i_D_val),
+           'converged': sol['converged'], 'iterations': sol['iterations'] }
+
+
+# Z_Z zener Impedance	(typically )
@@ -37,24 +37,52 @@ def unweave(iterable, n=2, return_final_n=False, arg1_name_in_errors='the `itera
 
     unweave( ['x0','y0','z0',('x1','y1','z1'),'x2','y2','z2', 'x3'], 3, True )
     # (1, ['x0', 'x1', 'x2', 'x3'],  ['y0', 'y1', 'y2'],   ['z0', 'z1', 'z2'])
+
+  The numpy fast path: if iterable is a 1-D numpy array, the return is n strided views of it (iterable[i::n])
+  rather than lists, so nothing is copied. A 2-D array is taken as rows of n elements (the returned views
+  are its columns). See iterUnweave for the streaming form.
   '''
+  if _isNdarray(iterable) and iterable.ndim in (1, 2):
+    if iterable.ndim == 2:
+      if iterable.shape[1] != n:
+        raise ValueError(f'When {arg1_name_in_errors} is a 2-D array, each row must have {n} elements')
+      unweaved, final_n = tuple(iterable.T), 0
+    else:
+      unweaved, final_n = tuple( iterable[i::n] for i in range(n) ), len(iterable) % n
+    return unweaved if not return_final_n else (final_n, *unweaved)
+
   unweaved_lists = [ [] for _ in range(n) ]
-  unweaved_idx = 0
+  final_n = 0
+  for cycle in iterUnweave(iterable, n, arg1_name_in_errors):
+    for unweaved_list, el in zip(unweaved_lists, cycle): unweaved_list.append(el)
+    final_n = len(cycle) % n
+  if not return_final_n: return (*unweaved_lists,)
+  else: return (final_n, *unweaved_lists,)
+
+def iterUnweave(iterable, n=2, arg1_name_in_errors='the `iterable` argument'):
+  '''iterUnweave(iterable, n=2)
+  the streaming form of unweave: a generator of n-tuples, one per cycle, taking elements from iterable (any
+  iterable or iterator, its length is never needed) only as they are needed. Inner iterables are handled as
+  they are by unweave. If the last cycle is incomplete, the last tuple is shorter than n.
+  Example:
+    list(iterUnweave( ['x0','y0',('x1','y1'),'x2'] ))  # [('x0', 'y0'), ('x1', 'y1'), ('x2',)]
+  '''
+  cycle = []
   for el in iterable:
     if not isinstance(el, str) and hasattr(el, '__len__'):
-      if unweaved_idx != 0:
+      if cycle:
         raise ValueError(f'Iterables within {arg1_name_in_errors} must occur after n={n} elements have been unweaved')
-      if len(el) == n:
-        for unweaved_i, inner_el in enumerate(el):
-          unweaved_lists[unweaved_i].append(inner_el)
-        unweaved_idx = 0
+      if len(el) == n: yield tuple(el)
       else:
         raise ValueError(f'When {arg1_name_in_errors} contains a iterable, the contained iterable must have {n} elements')
     else:
-      unweaved_lists[unweaved_idx].append(el) 
-      unweaved_idx = (unweaved_idx + 1) % n
-  if not return_final_n: return (*unweaved_lists,)
-  else: return (unweaved_idx, *unweaved_lists,)
+      cycle.append(el)
+      if len(cycle) == n:
+        yield tuple(cycle)
+        cycle = []
+  if cycle: yield tuple(cycle)
+
+def _isNdarray(obj): return hasattr(obj, 'ndim') and hasattr(obj, 'strides') # (without importing numpy)
 
 def lens(*sequences):
   '''tuple return is the lengths of each sequence in order passed'''
@@ -82,18 +110,25 @@ def weave(*iterables, allow_gaps=True, gap_fill=None):
     Gap-less weave: weave([1,4], [2,5], [3,6])  # [1,2,3,4,5,6]
     Filled gaps:    weave([1,4], [2], [3,6])    # [1,2,3,4,None,6]
     Un-filled gaps: weave([1,4], [2], [3,6], allow_gaps=False) # [1,2,3]
-  NOTE: requires lensMinMax'''
+
+  The numpy fast path: if every iterable is a 1-D numpy array, all of the same length, the return is a
+  numpy array (made with a single copy) rather than a list. See iterWeave for the streaming form.
+  NOTE: requires iterWeave'''
   if len(iterables) == 1: raise ValueError('weave requires more than one iterable')
-  weaved = []
-  len_min, len_max = lensMinMax(*iterables)
-  for i in range(len_min): weaved.extend( [ iterable[i] for iterable in iterables ] )
-  if allow_gaps and (len_max > len_min):
-    print(f'no filling gaps starting with {i} (so far we have {weaved})')
-    for i in range(len_min, len_max):
-      for iterable in iterables: 
-        try:    weaved.append(iterable[i])
-        except: weaved.append(gap_fill)
-  return weaved
+  if all(_isNdarray(it) and it.ndim == 1 for it in iterables) and len({len(it) for it in iterables}) == 1:
+    import numpy as np
+    return np.stack(iterables, axis=1).ravel()
+  return list(iterWeave(*iterables, allow_gaps=allow_gaps, gap_fill=gap_fill))
+
+def iterWeave(*iterables, allow_gaps=True, gap_fill=None):
+  '''iterWeave(*iterables, allow_gaps=True, gap_fill=None)
+  the streaming form of weave: returns an iterator of the weaved elements, taken from iterables (any
+  iterables or iterators, their lengths are never needed) only as they are needed. allow_gaps and
+  gap_fill are as with weave.'''
+  if len(iterables) == 1: raise ValueError('weave requires more than one iterable')
+  from itertools import chain, zip_longest
+  cycles = zip_longest(*iterables, fillvalue=gap_fill) if allow_gaps else zip(*iterables)
+  return chain.from_iterable(cycles)
 
 
 def yValsToCoords(y_vals, x0=0, x_step=1):
@@ -105,8 +140,8 @@ def yValsToCoords(y_vals, x0=0, x_step=1):
   return l_of_tups
 
 
-def interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline_degree=1, x=None, show_plot=False):
-  '''interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline_degree=1, x=None, show_plot=False)
+def interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline_degree=1, x=None, show_plot=False, backend=None):
+  '''interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline_degree=1, x=None, show_plot=False, backend=None)
   interpCoords is a wrapper around sympy.interpolating_spline.
 
   With default kwargs (one argument),
@@ -129,10 +164,19 @@ def interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline
     show_plot=False, (default) which means the Piecewise expression is returned
     show_plot=True, which passes Piecewise expression the sympy.plot, without returning it or
     show_plot='and return, which passes Piecewise expression the sympy.plot, and returns it. 
+
+  backend='numpy' returns a function instead of the Piecewise, which takes a number or an array of x values
+  and returns the interpolated y value(s) as a float or float64 array (nan where x is out of the range of
+  x values, as with the Piecewise). For spline_degree=1 it's numpy.interp. Otherwise it's the same B-spline
+  (same knots) as interpolating_spline, but its coefficient table is solved for numerically, once, and 
+  evaluation is a searchsorted for each x's knot span then de Boor's recursion on the degree+1 coefficients
+  that are non-zero there. x and show_plot are ignored with backend='numpy'.
+    transfer = interpCoords([(0, 0), (1, 0.8), (2, 1.1), (3, 1.2)], spline_degree=3, backend='numpy')
+    transfer(numpy.linspace(0, 3, 100_000))
   # NOTE: imports: sympy.interpolating_spline, numpy.argsort numpy.array, sympy.abc.x (sometimes)'''
   from numpy import argsort, array
   from sympy import interpolating_spline
-  if corresponding_y_vals:
+  if corresponding_y_vals is not None:
     x_vals = coordinates_or_sorted_x_vals
     y_vals = corresponding_y_vals
   else:
@@ -147,6 +191,10 @@ def interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline
   
 
   if spline_degree >= len(x_vals): spline_degree = len(x_vals) - 1
+  if backend == 'numpy':
+    if spline_degree == 1: return _linearInterpFunc(x_vals, y_vals)
+    else: return _bsplineInterpFunc(x_vals, y_vals, spline_degree)
+  elif backend is not None: raise ValueError(f"backend must be None (sympy) or 'numpy' ({backend!r} given)")
   if not x: from sympy.abc import x
 
   '''
@@ -167,10 +215,63 @@ def interpCoords(coordinates_or_sorted_x_vals, corresponding_y_vals=None, spline
     return s
 
 
+def _linearInterpFunc(x_vals, y_vals):
+  import numpy as np
+  x_vals, y_vals = np.array(x_vals, dtype=float), np.array(y_vals, dtype=float)
+  def interp(x):
+    y = np.interp(x, x_vals, y_vals, left=np.nan, right=np.nan)
+    return float(y) if np.ndim(y) == 0 else y
+  return interp
+
+def _bsplineBasis(knots, degree, x):
+  # returns (span, N) where knots[span] <= x < knots[span+1] and N[:, k] is the value at x of the B-spline
+  # basis function span-degree+k, the only degree+1 that are non-zero there (de Boor/Cox, vectorized over x)
+  import numpy as np
+  n_coeffs = len(knots) - degree - 1
+  span = np.clip(np.searchsorted(knots, x, side='right') - 1, degree, n_coeffs - 1)
+  N = np.zeros((len(x), degree + 1))
+  N[:, 0] = 1
+  left, right = np.zeros_like(N), np.zeros_like(N)
+  for j in range(1, degree + 1):
+    left[:, j] = x - knots[span + 1 - j]
+    right[:, j] = knots[span + j] - x
+    saved = 0
+    for r in range(j):
+      temp = N[:, r] / (right[:, r + 1] + left[:, j - r])
+      N[:, r] = saved + right[:, r + 1] * temp
+      saved = left[:, j - r] * temp
+    N[:, j] = saved
+  return span, N
+
+def _bsplineInterpFunc(x_vals, y_vals, degree):
+  # the same spline as sympy.interpolating_spline (same knots), but its coefficients are solved numerically
+  import numpy as np
+  x_vals, y_vals = np.array(x_vals, dtype=float), np.array(y_vals, dtype=float)
+  if not np.all(np.diff(x_vals) > 0): raise ValueError('the x values must be unique')
+  if degree % 2:
+    interior_knots = x_vals[(degree + 1)//2 : -((degree + 1)//2)]
+  else:
+    j = degree // 2
+    interior_knots = (x_vals[j : -j - 1] + x_vals[j + 1 : -j]) / 2
+  knots = np.concatenate(( [x_vals[0]] * (degree + 1), interior_knots, [x_vals[-1]] * (degree + 1) ))
+
+  span, N = _bsplineBasis(knots, degree, x_vals) # collocation: each row has degree+1 non-zeros
+  A = np.zeros((len(x_vals), len(x_vals)))
+  A[np.arange(len(x_vals))[:, None], span[:, None] - degree + np.arange(degree + 1)] = N
+  coeffs = np.linalg.solve(A, y_vals)
+
+  def interp(x):
+    x = np.asarray(x, dtype=float)
+    flat = x.ravel()
+    span, N = _bsplineBasis(knots, degree, flat)
+    y = np.einsum('ij,ij->i', N, coeffs[span[:, None] - degree + np.arange(degree + 1)])
+    y = np.where((flat >= x_vals[0]) & (flat <= x_vals[-1]), y, np.nan).reshape(x.shape)
+    return float(y) if y.ndim == 0 else y
+  return interp
+
 
 def bitflipUInt(uint, bit_len):
-  mask = eval(f'0b{"1"*bit_len}')
-  return ~uint & mask
+  return ~uint & ((1 << bit_len) - 1)
 
 def bitmaskList(bitmask_int, bit_vals, lsb_last=False, inv=False):
   '''takes a non-negative bitmask_int, splits it into bits
@@ -188,16 +289,27 @@ def bitmaskList(bitmask_int, bit_vals, lsb_last=False, inv=False):
     bitmaskList(0b101, [1, 2, 3])  # [1, 3]
     bitmaskList(0b00, [1, 2, 3])   # []
     bitmaskList(0b101, [1, 2, 3], inv=True) # [2]
+  For every bitmask int of n bits at once, see bitmaskMatrix.
   '''
   if inv: bitmask_int = bitflipUInt(bitmask_int, len(bit_vals))
-  from itertools import compress  # lst_els_true_in_bools = compress(lst, bools) ...
-  # but it also works if the bools list is integers, but not if bools is a string...
-  # So, first convert to list of string integers. Below, the [2:] is to shave off '0b'
-  # at start of string bool and the zfill pads 0's on left so len matches bit_vals:
-  ibool_lst = list(bin(bitmask_int)[2:].zfill(len(bit_vals))) 
-  ibool_lst = list(map(int, ibool_lst)) # then convert to list of integers.
-  if not lsb_last: ibool_lst.reverse() # reverse if lsb is last
-  return list(compress(bit_vals, ibool_lst)) 
+  if lsb_last: # bit_vals[0] is the most significant bit (of bit_vals or of bitmask_int if it has more bits)
+    msb = max(len(bit_vals), bitmask_int.bit_length()) - 1
+    return [ val for i, val in enumerate(bit_vals) if bitmask_int >> (msb - i) & 1 ]
+  return [ val for i, val in enumerate(bit_vals) if bitmask_int >> i & 1 ]
+
+def bitmaskMatrix(n_bits, lsb_last=False, inv=False):
+  '''bitmaskMatrix(n_bits, lsb_last=False, inv=False)
+  returns a numpy bool array of shape (2**n_bits, n_bits) where row bint is the selection bitmaskList 
+  makes with bint, i.e. bit_vals[matrix[bint]] == bitmaskList(bint, bit_vals, lsb_last, inv) for 
+  a numpy array bit_vals of n_bits elements (lsb_last and inv are as with bitmaskList). This 
+  lets a whole state space be evaluated with one matrix product. For example, the conductance of 
+  every combination of parallel resistors (row 0 being none of them):
+    bitmaskMatrix(4) @ (1 / numpy.array([1e3, 2e3, 4e3, 8e3]))'''
+  import numpy as np
+  matrix = (np.arange(2**n_bits, dtype=np.uint64)[:, None] >> np.arange(n_bits, dtype=np.uint64)) & 1
+  matrix = matrix.astype(bool)
+  if lsb_last: matrix = matrix[:, ::-1]
+  return ~matrix if inv else matrix
 
 def nBitBin(u_int, bits, prepend='0b'):
   return f'{prepend}{bin(u_int)[2:].zfill(bits)}'
\ No newline at end of file
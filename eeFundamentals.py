@@ -6,35 +6,103 @@ import sympy as sp
 from sympy.parsing.latex import parse_latex
 from eeMath.math_helpers import lambdifier
 from eeMath.discrete import bitmaskList
+from eeMath.eq_cache import cachedEqs
+from eeMath.units import parseNum
 
 
 from eeMath.eeSymbols import V, I, R, Rll, R_IN, R_GND,v_in, v_out, V_pull, R_pull, V_REF, r_out
 
 ohmslaw_V_eq = sp.Eq(V, I*R)
-ohmslaw_I_eq = sp.Eq(I, sp.solve(ohmslaw_V_eq, I)[0])
-ohmslaw_R_eq = sp.Eq(R, sp.solve(ohmslaw_V_eq, R)[0])
-
 
 with sp.evaluate(False):
   vdiv_out_eq = sp.Eq(v_out, v_in * (R_GND/(R_IN + R_GND)))
 
-vdiv_R_IN_eq = sp.Eq(R_IN, sp.solve(vdiv_out_eq, R_IN)[0])
-vdiv_v_in_eq = sp.Eq(v_in, sp.solve(vdiv_out_eq, v_in)[0])
-vdiv_R_GND_eq = sp.Eq(R_GND, sp.solve(vdiv_out_eq, R_GND)[0])
+def _solvedEqs(): # built once, then loaded from the equation cache (see eq_cache.py)
+  return {
+    'ohmslaw_I_eq': sp.Eq(I, sp.solve(ohmslaw_V_eq, I)[0]),
+    'ohmslaw_R_eq': sp.Eq(R, sp.solve(ohmslaw_V_eq, R)[0]),
+    'vdiv_R_IN_eq': sp.Eq(R_IN, sp.solve(vdiv_out_eq, R_IN)[0]),
+    'vdiv_v_in_eq': sp.Eq(v_in, sp.solve(vdiv_out_eq, v_in)[0]),
+    'vdiv_R_GND_eq': sp.Eq(R_GND, sp.solve(vdiv_out_eq, R_GND)[0]),
+  }
+
+_solved = cachedEqs('eeFundamentals', _solvedEqs)
+ohmslaw_I_eq = _solved['ohmslaw_I_eq']
+ohmslaw_R_eq = _solved['ohmslaw_R_eq']
+
+vdiv_R_IN_eq = _solved['vdiv_R_IN_eq']
+vdiv_v_in_eq = _solved['vdiv_v_in_eq']
+vdiv_R_GND_eq = _solved['vdiv_R_GND_eq']
+
+# vdiv_out_eq already solved for each of its symbols (so mkfuncVDivSolver doesn't call sp.solve)
+vdiv_eq_of = { v_out: vdiv_out_eq, R_IN: vdiv_R_IN_eq, v_in: vdiv_v_in_eq, R_GND: vdiv_R_GND_eq }
 
 # this could/should be made generic: a lambdifier option that does the pre-solve for you
-def mkfuncVDivSolver(solve_for, *required_symbol_args, **symbol_with_defaults):
+def mkfuncVDivSolver(solve_for, *required_symbol_args, backend=None, **symbol_with_defaults):
   '''examples:
     vdivRin = mkfuncVDivSolver(R_IN, v_out, v_in=5, R_GND=10000)
   vdivRin is then equivalent to:
     def vdivRin(Vout, Vin=5, R2=10000): return ( ( Vin - Vout ) * R2 ) / Vout
-    
+  backend is passed to lambdifier (pass backend='numpy' for a function that accepts arrays).
   '''
-  expr = sp.solve(vdiv_out_eq, solve_for)[0]
-  return lambdifier(expr, *required_symbol_args, **symbol_with_defaults)
+  if solve_for in vdiv_eq_of: expr = vdiv_eq_of[solve_for].rhs
+  else: expr = sp.solve(vdiv_out_eq, solve_for)[0]
+  return lambdifier(expr, *required_symbol_args, backend=backend, **symbol_with_defaults)
 
 # def vdivRin(Vout, Vin=5, R2=10000): return ( ( Vin - Vout ) * R2 ) / Vout
 
+def bestDivider(ratio, series='E96', r_total_range=(1e3, 1e6), top_k=5):
+  '''bestDivider(ratio, series='E96', r_total_range=(1e3, 1e6), top_k=5)
+  searches for the standard resistor pairs (see eSeriesIndex) whose voltage divider ratio
+    v_out/v_in = R_GND/(R_IN + R_GND) 
+  is closest to ratio (0 < ratio < 1), only considering pairs whose total resistance, R_IN + R_GND,
+  is within r_total_range (inclusive). ratio can also be a string such as '1/3' or an expression
+  evaluating to a number. Returns a list of up to top_k dicts, best first:
+    { 'R_IN': float, 'R_GND': float, 'ratio': actual ratio, 'error': (actual - ratio)/ratio }
+  Rather than trying every pair, for each R_GND the R_IN's that keep the total in r_total_range are a
+  window of the sorted series, and the ideal R_IN = R_GND*(1 - ratio)/ratio is placed in it with a
+  binary search. The error only grows moving away from the ideal, so the candidates are the top_k
+  nearest R_IN's either side of it within the window (fewer where the window runs out):
+  O(N (log N + top_k)) for N standard values in range.
+  Example:
+    bestDivider(1/3, 'E24', (10e3, 100e3), top_k=1) # [{'R_IN': 15000.0, 'R_GND': 7500.0, ...}]'''
+  import numpy as np
+  from eeMath.resistance import eSeriesIndex
+  ratio = float(sp.sympify(ratio))
+  if not 0 < ratio < 1: raise ValueError(f'bestDivider ratio must be between 0 and 1 (got {ratio})')
+  r_total_min, r_total_max = (parseNum(r) for r in r_total_range)
+  if top_k <= 0: return []
+
+  index = eSeriesIndex(series)
+  index = index[index < r_total_max] # neither resistor can be more than the total
+  R_GND_vals = index
+  # the window [lo, hi) of R_IN's in range for each R_GND, and the ideal R_IN's position in it
+  lo = np.searchsorted(index, r_total_min - R_GND_vals, 'left')
+  hi = np.searchsorted(index, r_total_max - R_GND_vals, 'right')
+  ideal = np.clip(np.searchsorted(index, R_GND_vals * (1 - ratio) / ratio), lo, hi)
+  steps = np.arange(top_k)
+  below, above = ideal[:, None] - 1 - steps, ideal[:, None] + steps # widening outward from the ideal
+  R_IN_i = np.concatenate((below, above), axis=1)
+  valid = np.concatenate((below >= lo[:, None], above < hi[:, None]), axis=1)
+  R_GND_cand = np.broadcast_to(R_GND_vals[:, None], R_IN_i.shape)[valid]
+  R_IN_cand = index[R_IN_i[valid]]
+  R_total = R_IN_cand + R_GND_cand
+  in_range = (R_total >= r_total_min) & (R_total <= r_total_max) # (only float rounding at the window edges)
+  R_GND_cand, R_IN_cand, R_total = R_GND_cand[in_range], R_IN_cand[in_range], R_total[in_range]
+
+  actual = R_GND_cand / R_total
+  error = (actual - ratio) / ratio
+  top_k = min(top_k, len(error))
+  if top_k == 0: return []
+  abs_error = np.abs(error)
+  kth_error = np.partition(abs_error, top_k - 1)[top_k - 1]
+  best = np.flatnonzero(abs_error <= kth_error) # (more than top_k if there are ties at the kth)
+  best = best[np.lexsort((R_total[best], abs_error[best]))][:top_k] # best first, lowest total breaks ties
+  return [ 
+    { 'R_IN': float(R_IN_cand[i]), 'R_GND': float(R_GND_cand[i]), 'ratio': float(actual[i]), 'error': float(error[i]) } 
+    for i in best 
+  ]
+
 
 def voltageAtResistorJunction(*Vn_Rn_tuples, exact=False, evaluate=False):
   '''Usage Example: voltageAtResistorJunction((v_out, 33*kΩ),(0, 27*kΩ),(5,27*kΩ))
@@ -46,6 +114,7 @@ def voltageAtResistorJunction(*Vn_Rn_tuples, exact=False, evaluate=False):
   TODO: prevent division to evaluation of division irrationals: I tried sp.Rational but you can't use that with sp.parse_expr
     UPDATE: Workaround: place the assignment using `sp.parse_expr` inside a `with sp.evaluate(False):` block.
   TODO: maybe return newly created symbols?
+  For evaluating the same numeric resistors with many voltages, see prepareJunction.
   '''
   numerator = 0   # sum of each Vn/Rn
   denominator = 0 # sum of each 1/Rn
@@ -82,6 +151,50 @@ def voltageAtResistorJunction(*Vn_Rn_tuples, exact=False, evaluate=False):
 
 vRJunct = voltageAtResistorJunction
 
+def prepareJunction(*Rn):
+  '''prepareJunction(*Rn)
+  returns junction(voltages, exact=False): the voltage of the junction of the resistors Rn (numbers or
+  strings like '27k') given the voltage at the other end of each, as vRJunct does, but with each
+  resistor's weight, (1/Rn) / sum(1/R), computed once. voltages is a sequence of len(Rn) voltages or an
+  array of them of shape (..., len(Rn)), e.g. one row per sample, which is evaluated as a single matrix
+  product and returns shape (...). With exact=True, the voltages are parsed as exact decimals and the
+  return is an sp.Rational (or an object array of them).
+  The returned function has the attributes weights (a float array), exact_weights (fractions.Fraction)
+  and R_parallel (the parallel resistance of Rn, i.e. the junction's output resistance).
+  Example:
+    junction = prepareJunction('33k', '27k', '27k')
+    junction([3.3, 0, 5])                                         # one evaluation
+    junction(np.column_stack([v_outs, np.zeros(n), np.full(n, 5)])) # a batch of n v_out samples'''
+  import numpy as np
+  from fractions import Fraction
+  from eeMath.units import parseMany
+  if not Rn: raise ValueError('a junction needs at least one resistor')
+  if any( isinstance(R, sp.Basic) and not R.is_number for R in Rn ):
+    raise ValueError('prepareJunction needs numeric resistances: use voltageAtResistorJunction for symbolic ones')
+  Rn = [ (Fraction(int(R.p), int(R.q)) if R.is_Rational else float(R)) if isinstance(R, sp.Basic) else R for R in Rn ]
+  conductances = [ 1 / R for R in parseMany(Rn, exact=True) ]
+  G_total = sum(conductances)
+  exact_weights = np.empty(len(Rn), dtype=object)
+  exact_weights[:] = [ G / G_total for G in conductances ]
+  weights = exact_weights.astype(float)
+
+  def junction(voltages, exact=False):
+    if exact:
+      V = np.asarray(voltages, dtype=object)
+      if V.shape[-1:] != (len(Rn),): raise ValueError(f'expected {len(Rn)} voltages (in the last axis), got shape {V.shape}')
+      V_out = parseMany(V, exact=True) @ exact_weights
+      if not np.ndim(V_out): return sp.Rational(V_out)
+      return np.vectorize(sp.Rational, otypes=[object])(V_out)
+    V = np.asarray(voltages)
+    if V.dtype.kind not in 'biuf': V = parseMany(np.asarray(voltages, dtype=object))
+    if V.shape[-1:] != (len(Rn),): raise ValueError(f'expected {len(Rn)} voltages (in the last axis), got shape {V.shape}')
+    V_out = V @ weights
+    return float(V_out) if not np.ndim(V_out) else V_out
+
+  junction.weights, junction.exact_weights = weights, exact_weights
+  junction.R_parallel = sp.Rational(1 / G_total)
+  return junction
+
 def vDivExpr(v1, r1, r2, v2=0):
   with sp.evaluate(False):
     if v2 == 0: return v1 * (r2/(r1+r2))
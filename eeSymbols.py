@@ -33,7 +33,52 @@ from re import split as re_split
 from collections import OrderedDict
 
 
-@func_attr(latexify='auto', force_subscript=True,force_subscript_warning=False, hist=OrderedDict(), subs={})
+class SymbRegistry(OrderedDict):
+  '''The type of symbs.hist: an OrderedDict of each symbol declared with symbs (least recent first) mapped
+  to a dict of its details, which also keeps an index (.by_name) of provided_name: [symbols] (least recent
+  first) so that getSymb doesn't need to scan every symbol ever declared.'''
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.by_name = {}
+    for symb, details in self.items(): self.by_name.setdefault(details['provided_name'], []).append(symb)
+
+  def register(self, symb, details):
+    '''adds the entry for symb or, if it's already there, replaces it and bumps it to most recent'''
+    if symb in self:
+      self.move_to_end(symb)
+      same_name = self.by_name.get(self[symb]['provided_name'], [])
+      if symb in same_name: same_name.remove(symb)
+    self[symb] = details
+    self.by_name.setdefault(details['provided_name'], []).append(symb)
+
+  def find(self, provided_name):
+    '''returns a list of the symbols declared with provided_name, least recent first'''
+    return [ symb for symb in self.by_name.get(provided_name, ()) # (skips any deleted from self directly)
+             if symb in self and self[symb]['provided_name'] == provided_name ]
+
+def _symbsHist():
+  # symbs.hist can be reassigned by the user so make sure it is (still) a SymbRegistry
+  if not isinstance(symbs.hist, SymbRegistry):
+    symbs.hist = SymbRegistry(symbs.hist if isinstance(symbs.hist, OrderedDict) else ())
+  return symbs.hist
+
+
+def _lruGet(func, key):
+  # returns func.cache[key] (bumping it) or None, counting the hit/miss on func
+  if key in func.cache:
+    func.hits += 1
+    func.cache.move_to_end(key)
+    return func.cache[key]
+  func.misses += 1
+  return None
+
+def _lruPut(func, key, value):
+  func.cache[key] = value
+  while len(func.cache) > func.maxsize: func.cache.popitem(last=False)
+
+
+@func_attr(latexify='auto', force_subscript=True,force_subscript_warning=False, hist=SymbRegistry(), subs={},
+           maxsize=1024, hits=0, misses=0, cache=OrderedDict())
 def symbs(string_names, *, replace_each={}, latexify=None, force_subscript=None, force_subscript_warning=None, hist_attrs={}, cls=Symbol, **kwargs):
   '''
   Use this in place of symbols/Symbol to make Symbol object since this function let you pass in the
@@ -48,6 +93,10 @@ def symbs(string_names, *, replace_each={}, latexify=None, force_subscript=None,
   1) we can add a global registry mapping symbol str reps <-> variable names (as passed to symbs)
   2) Having symbs check this registry and warn/block redeclarations as per 2 new symbs props
   3) Make laTeXToPy func which users can pass latex to in order to see python that would define it. 
+  Symbols are interned: a call with the same string_names, replace_each, latexify settings and assumptions
+  (kwargs) as a previous one returns the same Symbol objects without redoing the name processing or calling
+  symbols() (they are still re-registered in symbs.hist/symbs.subs). The least recently used entry is
+  dropped once there are more than symbs.maxsize of them. See symbsCacheInfo() for hit/miss counts.
   # NOTE: requires func_attr, printlToStr, strReplaceEach
   '''
   # test with: symbs('R R1 R2 Rvb R_v_m R_v_mf')
@@ -65,16 +114,26 @@ def symbs(string_names, *, replace_each={}, latexify=None, force_subscript=None,
 
   kwargs['cls'] = cls
 
+  hist = _symbsHist()
+  hist_attrs['about'] = str(hist_attrs['about']) if 'about' in hist_attrs else '' # about:str is a required attribute for symbs
 
-  symbnames =  [x for x in re_split(',[ ]*|[ ]+', string_names) if x.strip()] # the list compr. is to remove all-whitespace els
+  try:
+    key = ( string_names, tuple(replace_each.items()), symbs.latexify, symbs.force_subscript,
+            symbs.force_subscript_warning, tuple(sorted(kwargs.items())) )
+    interned = _lruGet(symbs, key)
+  except TypeError: # unhashable assumption value: no interning
+    key = interned = None
+  if interned is not None:
+    symbs_tuple, provided_names, sympy_names = interned
+    hist_update_arr = [ {'provided_name': provided_name, 'sympy_name': sympy_name, **hist_attrs, **kwargs}
+                        for provided_name, sympy_name in zip(provided_names, sympy_names) ]
+    return _registerSymbs(hist, symbs_tuple, hist_update_arr)
 
-  if not isinstance(symbs.hist, OrderedDict): symbs.hist = OrderedDict()
+  symbnames =  [x for x in re_split(',[ ]*|[ ]+', string_names) if x.strip()] # the list compr. is to remove all-whitespace els
 
   # hist_update = OrderedDict()
   hist_update_arr = []
 
-  hist_attrs['about'] = str(hist_attrs['about']) if 'about' in hist_attrs else '' # about:str is a required attribute for symbs
-
   if symbs.latexify:
     varnames = symbnames
     for i in range(len(varnames)):
@@ -94,36 +153,49 @@ def symbs(string_names, *, replace_each={}, latexify=None, force_subscript=None,
 
   dups =  {x for x in symbnames if symbnames.count(x) > 1}
   if dups: raise ValueError(printlToStr('Duplicate symbol string representations:', *dups))
-  symbnames = ' '.join(symbnames)
-  symbs_tuple = symbols(symbnames, **kwargs)
+  symbs_tuple = symbols(' '.join(symbnames), **kwargs)
+  if key is not None:
+    _lruPut(symbs, key, (symbs_tuple, [d['provided_name'] for d in hist_update_arr], symbnames))
+
+  return _registerSymbs(hist, symbs_tuple, hist_update_arr)
 
-  hist_update = OrderedDict()
+
+def _registerSymbs(hist, symbs_tuple, hist_update_arr):
+  # register (or re-register, bumping to most recent) each symbol
   if type(symbs_tuple) == tuple:
     for i in range(len(symbs_tuple)):
-      hist_update[symbs_tuple[i]] = hist_update_arr[i]
+      hist.register(symbs_tuple[i], hist_update_arr[i])
   elif len(hist_update_arr) == 1:
-    hist_update[symbs_tuple] = hist_update_arr[0]
-  
-
-  # rather than modifying, delete any entries and re-add to bump their position up
-  symbs.hist = OrderedDict({k: symbs.hist[k] for k in symbs.hist if k not in hist_update})
-  symbs.hist.update(hist_update)
+    hist.register(symbs_tuple, hist_update_arr[0])
 
   # Append symbs.subs with new keys/values where both for each is the symbol to be returned.
   # Unless specified otherwise later on, we set each to itself which disables substitions with subs()
 
   if isinstance(symbs_tuple, tuple):
-    symbs.subs = {**symbs.subs, **{sym:sym for sym in symbs_tuple} }
+    symbs.subs.update( {sym:sym for sym in symbs_tuple} )
   elif isinstance(symbs_tuple, Symbol): symbs.subs[symbs_tuple] = symbs_tuple
 
   return symbs_tuple
 
 
+def symbsCacheInfo(clear=False):
+  '''returns dict of hits, misses, size and maxsize of both the symbs interning cache and the
+  varnameToLaTeX memo cache, as {'symbs': {...}, 'varnameToLaTeX': {...}}.
+  If clear=True, the caches are emptied and the counters are reset (after getting the returned info).
+  To change the maximum number of entries kept: symbs.maxsize = n or varnameToLaTeX.maxsize = n'''
+  info = {}
+  for func in (symbs, varnameToLaTeX):
+    info[func.__name__] = { 'hits': func.hits, 'misses': func.misses, 'size': len(func.cache), 'maxsize': func.maxsize }
+    if clear:
+      func.cache.clear()
+      func.hits = func.misses = 0
+  return info
+
 
 def getSymb(provided_name, find_all=False, recent=True, details=False, create=False, **kwargs):
   '''This might be a temporary function until we fix symbs to return previously 
-  declared symbols rather than make duplicates and fix symbs.hist to index by
-  provided name rather than by symbol object. 
+  declared symbols rather than make duplicates. Lookups use the symbs.hist.by_name 
+  index so they don't depend on how many symbols have been declared.
 
   But for the time being, you can use this function to search and/or create
   symbols by their name as string in the following ways (you can optionally
@@ -161,17 +233,15 @@ def getSymb(provided_name, find_all=False, recent=True, details=False, create=Fa
   3b. v_symb_dict = getSymb('v_symb', details=True) # like 1a. 
   4b...6b are all possible as well, by adding `details=True` to 4a...6b
   '''
-  if find_all: results = []
-  hist_items = reversed(symbs.hist.items()) if recent else symbs.hist.items()
-  
-  for symb, d in hist_items:
-    if d['provided_name'] == provided_name:
-      thing = d if details else symb
-      if find_all: results.append(thing)
-      elif create == 'inform': return thing, False
-      else: return thing
-  
-  if find_all: return tuple(results)
+  hist = _symbsHist()
+  found = hist.find(provided_name)
+  if recent: found.reverse()
+  if details: found = [ hist[symb] for symb in found ]
+
+  if find_all: return tuple(found)
+  elif found:
+    if create == 'inform': return found[0], False
+    else: return found[0]
   elif create:
     if create == 'inform':
       return symbs(provided_name, **kwargs), True
@@ -198,9 +268,20 @@ def getSymb(provided_name, find_all=False, recent=True, details=False, create=Fa
 
 
 
+@func_attr(maxsize=1024, hits=0, misses=0, cache=OrderedDict())
 def varnameToLaTeX(provided_name, replace_each={}): # helper for symbs and user
   # if not provided_name.isidentifier() : return provided_name
   # NOTE: requires: strReplaceEach
+  # memoized on the arguments and symbs.force_subscript (but not while warnings are on, so they're still printed)
+  if symbs.force_subscript_warning: return _varnameToLaTeX(provided_name, replace_each)
+  key = (provided_name, tuple(replace_each.items()), symbs.force_subscript)
+  latex = _lruGet(varnameToLaTeX, key)
+  if latex is None:
+    latex = _varnameToLaTeX(provided_name, replace_each)
+    _lruPut(varnameToLaTeX, key, latex)
+  return latex
+
+def _varnameToLaTeX(provided_name, replace_each):
   if replace_each:
     provided_name = strReplaceEach(provided_name, replace_each)
   subscripts = provided_name.split('_')
@@ -270,6 +351,7 @@ beta_0 = symbs('beta_0', replace_each={'b': r'\b'},  about='BJT (active mode) fo
 V_A  = symbs('V_A', about='BJT Early voltage (typically 15–150V; smaller for smaller devices)', **real_nonneg)
 
 R_B, R_C, R_E  = symbs('R_B, R_C, R_E', about='BJT with resistor', **real_nonneg) # With resistor
+V_CC, V_BB = symbs('V_CC, V_BB', about='BJT supply voltage and (Thevenin equivalent) base bias voltage', **real_finite)
 
 v_RB, v_RC, v_RE  = symbs('v_RB, v_RC, v_RE', about='BJT involving resistor (small signal model)', **real_finite) # Involving Resistor
 
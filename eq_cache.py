@@ -0,0 +1,102 @@
+import sympy as sp
+from hashlib import sha256
+from os import environ, replace, getpid
+from pathlib import Path
+from pickle import dump, load, HIGHEST_PROTOCOL
+
+from eeMath.general_helpers import func_attr
+
+###### EQUATION CACHE #############################################################################
+
+# The derived module-level equations (the ones that need sp.solve, simplify or .subs to build) are
+# written to a pickle file per "family" (usually the module name) the first time they are built and
+# loaded from it on every later import. Each file is keyed by a hash of the cache format version,
+# the sympy version and every .py source in this package, so editing any source (or upgrading sympy)
+# makes the cache stale and the equations are rebuilt and re-written on the next import.
+# The equations are stored as srepr strings rather than pickled sympy objects because unpickling
+# re-evaluates expressions that were built inside `with evaluate(False):` blocks. The srepr keeps the
+# args in their stored order (order='none', not the printing order), so that rebuilding them under
+# evaluate(False) gives objects equal (==, hash and .args) to the ones build() returned.
+
+# Environment:
+#   EEMATH_EQ_CACHE=0           disables the cache (always build)
+#   EEMATH_EQ_CACHE=/some/dir   writes/reads the cache files in /some/dir instead of __pycache__
+
+_format_version = 1
+_pkg_dir = Path(__file__).parent
+
+# modules that call cachedEqs at import time (imported by buildEqCache to register their builders)
+_family_modules = ( 'eeMath.eeFundamentals', 'eeMath.opamp', 'eeMath.ota' )
+
+
+@func_attr(digest=None)
+def _sourceHash():
+  if _sourceHash.digest is None:
+    h = sha256(f'{_format_version} {sp.__version__}'.encode())
+    for path in sorted(_pkg_dir.glob('*.py')): h.update(path.read_bytes())
+    _sourceHash.digest = h.hexdigest()
+  return _sourceHash.digest
+
+
+def eqCacheFile(family):
+  '''returns the Path of the cache file for family (whether or not it exists yet)'''
+  cache_dir = environ.get('EEMATH_EQ_CACHE', '')
+  cache_dir = Path(cache_dir) if cache_dir not in ('', '1') else _pkg_dir / '__pycache__'
+  return cache_dir / f'eqs.{family}.pickle'
+
+
+def _writeEqs(family, eqs):
+  path = eqCacheFile(family)
+  tmp_path = path.with_name(f'{path.name}.{getpid()}.tmp')
+  try:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+      dump({'key': _sourceHash(), 'eqs': {name: sp.srepr(eq, order='none') for name, eq in eqs.items()}}, f, HIGHEST_PROTOCOL)
+    replace(tmp_path, path) # atomic so concurrently starting processes never read a partial file
+  except OSError: return None # e.g. read-only install: we just rebuild every time
+  return path
+
+
+def _readEqs(family):
+  try:
+    with open(eqCacheFile(family), 'rb') as f: cached = load(f)
+    if cached['key'] != _sourceHash(): return None # stale
+    namespace = vars(sp)
+    with sp.evaluate(False):
+      return {name: eval(srepr_str, namespace) for name, srepr_str in cached['eqs'].items()}
+  except Exception: return None # missing or unreadable: rebuild
+
+
+@func_attr(enabled=environ.get('EEMATH_EQ_CACHE', '') != '0', builders={})
+def cachedEqs(family, build):
+  '''cachedEqs(family, build)
+  build is a function taking no arguments and returning a dict of name: sympy object. The return
+  is that dict, loaded from the cache file for `family` if it was written by the current sources,
+  otherwise build() is called and its return is written to the cache file before being returned.
+  Set cachedEqs.enabled = False (or EEMATH_EQ_CACHE=0 before import) to always call build().
+  Usage (at module level):
+    _solved = cachedEqs('eeFundamentals', _solvedEqs)
+    vdiv_R_IN_eq = _solved['vdiv_R_IN_eq']'''
+  cachedEqs.builders[family] = build
+  if not cachedEqs.enabled: return build()
+  eqs = _readEqs(family)
+  if eqs is None:
+    eqs = build()
+    _writeEqs(family, eqs)
+  return eqs
+
+
+def buildEqCache(*families):
+  '''the build step: (re)builds and writes the cache file of each family passed, or every family if
+  none are passed, regardless of whether the existing files are stale. Returns dict of family: path
+  (path is None if the file could not be written). Also runs with: python -m eeMath.eq_cache'''
+  from importlib import import_module
+  for module_name in _family_modules: import_module(module_name)
+  if not families: families = tuple(cachedEqs.builders)
+  return { family: _writeEqs(family, cachedEqs.builders[family]()) for family in families }
+
+
+if __name__ == '__main__':
+  # the family modules register their builders with eeMath.eq_cache, not with this __main__ copy
+  from eeMath.eq_cache import buildEqCache as _buildEqCache
+  for family, path in _buildEqCache().items(): print(f'{family}: {path}')
@@ -4,8 +4,10 @@ import sympy as sp
 
 
 from eeMath.eeSymbols import R, C, f_Hz, tau1, n_tau, n_midi, p_cnt
-from eeMath.units import getUnit, parseNum
-from eeMath.math_helpers import evalF
+from eeMath.units import getUnit, parseNum, parseMany
+from eeMath.math_helpers import evalF, cachedSolve
+from eeMath.general_helpers import func_attr
+from collections import OrderedDict
 
 
 #### TIME <> FREQUENCY CONVERSION ################################################################
@@ -28,40 +30,87 @@ p_cnt_after_n_tau_eq =  sp.Eq(p_cnt, 1 - sp.exp(-n_tau))
 n_tau_of_p_cnt_eq = sp.Eq(n_tau, sp.log(-1/(p_cnt - 1)))
 
 
+# The RC functions below take a fast path that skips sympy (returning floats, or numpy float64 arrays if any
+# argument is a list/tuple/array, which are broadcast together) unless exact=True or an argument is a
+# sympy object, in which case the equations are solved symbolically as before. Values can be strings 
+# with unit prefixes (see parseNum/parseMany). For scalars, [] is returned if there's no solution (as
+# sp.solve does) but for arrays the elements are inf or nan instead.
+
+def _isArrayLike(val): return isinstance(val, (list, tuple, range)) or getattr(val, 'ndim', 0) > 0
+
+def _isSymbolic(*vals): return any(isinstance(val, sp.Basic) for val in vals)
+
+def _rcArrays(*vals):
+  # returns the vals as float64 arrays and/or floats if any is array-like, otherwise None
+  if not any(_isArrayLike(val) for val in vals): return None
+  import numpy as np
+  return [ parseMany(val) if _isArrayLike(val) else np.float64(parseNum(val)) for val in vals ]
+
+
 def valOfRCWithTau(R_or_C_val, tau_val, n_tau=1, exact=False): 
-  R_or_C_val = parseNum(R_or_C_val)
-  if n_tau != 1: tau_val /= n_tau
-  
-  sol = sp.solve(tau1_of_RC_eq.subs({R: R_or_C_val, tau1: tau_val}), C)
-  if not sol: return sol
-  if exact:
-    if len(sol) == 1: return sol[0]
-    else: return sol
-  else:
-    return sol[0].evalf()
+  '''returns C for R_or_C_val=R (or R for R_or_C_val=C) such that n_tau time constants take tau_val seconds'''
+  if exact or _isSymbolic(R_or_C_val, tau_val, n_tau):
+    R_or_C_val = parseNum(R_or_C_val)
+    if n_tau != 1: tau_val /= n_tau
+    
+    sol = cachedSolve(tau1_of_RC_eq.subs({R: R_or_C_val, tau1: tau_val}), C)
+    if not sol: return sol
+    if exact:
+      if len(sol) == 1: return sol[0]
+      else: return sol
+    else:
+      return sol[0].evalf()
+
+  arrays = _rcArrays(R_or_C_val, tau_val, n_tau)
+  if arrays is not None:
+    R_or_C_val, tau_val, n_tau = arrays
+    return tau_val / (n_tau * R_or_C_val)
+  R_or_C_val, tau_val = parseNum(R_or_C_val), parseNum(tau_val)
+  if not R_or_C_val or not n_tau: return []
+  return tau_val / (n_tau * R_or_C_val)
 
 f_Hz_of_RC_at_n_tau_eq = sp.Eq( f_Hz, 1/(R * C * n_tau) )
 
 # C_val = sp.solve(eq.subs({f_Hz:8.175798915643707, n_tau:DCO_tc_span, R: max_R}) )[0].evalf()
 
 def valOfRCWithHz(R_or_C_val, f_hz, n_taus=1, exact=False): 
-  R_or_C_val = parseNum(R_or_C_val)
-  sol = sp.solve(f_Hz_of_RC_at_n_tau_eq.subs({f_Hz:f_hz, R: R_or_C_val, n_tau: n_taus}), C)
-  if not sol: return sol
-  if len(sol) == 1: 
-    if exact: return sol[0]
-    else: return parseNum(sol[0])
-  else: return sol
+  '''returns C for R_or_C_val=R (or R for R_or_C_val=C) such that n_taus time constants take 1/f_hz seconds'''
+  if exact or _isSymbolic(R_or_C_val, f_hz, n_taus):
+    R_or_C_val = parseNum(R_or_C_val)
+    sol = cachedSolve(f_Hz_of_RC_at_n_tau_eq.subs({f_Hz:f_hz, R: R_or_C_val, n_tau: n_taus}), C)
+    if not sol: return sol
+    if len(sol) == 1: 
+      if exact: return sol[0]
+      else: return parseNum(sol[0])
+    else: return sol
+
+  arrays = _rcArrays(R_or_C_val, f_hz, n_taus)
+  if arrays is not None:
+    R_or_C_val, f_hz, n_taus = arrays
+    return 1 / (f_hz * R_or_C_val * n_taus)
+  denom = parseNum(f_hz) * parseNum(R_or_C_val) * n_taus
+  if not denom: return []
+  return parseNum(1 / denom)
 
 def hzOfRC(R_val, C_val, n_taus=1, exact=False):
-  R_val = parseNum(R_val)
-  C_val = parseNum(C_val)
-  sol = sp.solve(f_Hz_of_RC_at_n_tau_eq.subs({R:R_val, C:C_val, n_tau: n_taus}), f_Hz)
-  if not sol: return sol
-  if len(sol) == 1: 
-    if exact: return sol[0]
-    else: return parseNum(sol[0])
-  else: return sol
+  '''returns the frequency (Hz) whose period is n_taus time constants of R_val and C_val'''
+  if exact or _isSymbolic(R_val, C_val, n_taus):
+    R_val = parseNum(R_val)
+    C_val = parseNum(C_val)
+    sol = cachedSolve(f_Hz_of_RC_at_n_tau_eq.subs({R:R_val, C:C_val, n_tau: n_taus}), f_Hz)
+    if not sol: return sol
+    if len(sol) == 1: 
+      if exact: return sol[0]
+      else: return parseNum(sol[0])
+    else: return sol
+
+  arrays = _rcArrays(R_val, C_val, n_taus)
+  if arrays is not None:
+    R_val, C_val, n_taus = arrays
+    return 1 / (R_val * C_val * n_taus)
+  denom = parseNum(R_val) * parseNum(C_val) * n_taus
+  if not denom: return []
+  return parseNum(1 / denom)
 
 def infoOnRC(R_val, C_val, forTau=[1,3,5]):
   from math import pi
@@ -77,6 +126,210 @@ def infoOnRC(R_val, C_val, forTau=[1,3,5]):
     ret[f'atTau{tc}'] = { 'ms':ms, 'hz':hz }
   return ret
 
+
+#### RC TRANSIENTS ###############################################################################
+
+# rcTransient simulates RC low-pass ladders (stage k being R[k] from node k-1 to node k and C[k] from
+# node k to ground, with the source at node 0) sampled every dt. The ladder is split into its modes (one
+# per stage, each an RC of its own tau, as in tau1_of_RC_eq) by an eigendecomposition, and each mode is
+# discretized exactly for an input that is linear between samples, i.e. the result at each sample is the
+# exact solution for the piecewise-linear source through the source's samples (so a breakpoint between
+# samples is rounded to the grid, and a step becomes a ramp over one dt). The samples of each chunk are
+# computed at once, by block matrix products (see _linearRecurrence), rather than a python loop over time.
+
+def pwlSource(points):
+  '''pwlSource(points)
+  returns the function of time (seconds, a number or array) of the piecewise-linear source through
+  points, a sequence of (t, v) pairs (either can be a string like '10m') in time order, held constant
+  before the first and after the last. Its points are in its times and values attributes.
+  Example (a 1ms attack to 5V held until 10ms then a 50ms release):
+    pwlSource([(0, 0), ('1m', 5), ('10m', 5), ('60m', 0)])'''
+  import numpy as np
+  times = parseMany([ t for t, _ in points ])
+  values = parseMany([ v for _, v in points ])
+  if not len(times): raise ValueError('a piecewise linear source needs at least one point')
+  if np.any(np.diff(times) < 0): raise ValueError('piecewise linear source points must be in time order')
+  source = lambda t: np.interp(t, times, values)
+  source.times, source.values = times, values
+  return source
+
+def _isPwlPoints(source):
+  return isinstance(source, (list, tuple)) and len(source) > 0 and all(
+    isinstance(point, (list, tuple)) and len(point) == 2 and not _isArrayLike(point[0]) for point in source )
+
+def _sourceSampler(source):
+  # returns a function of a times array (L,) returning the source values there, of shape (*batch, L)
+  import numpy as np
+  if callable(source): return lambda t: np.asarray(source(t), dtype=float)
+  if _isPwlPoints(source): return _sourceSampler(pwlSource(source))
+  if isinstance(source, (list, tuple)): # one source per circuit
+    samplers = [ _sourceSampler(each) for each in source ]
+    return lambda t: np.stack([ np.broadcast_to(sampler(t), t.shape) for sampler in samplers ])
+  value = parseMany(source) if _isArrayLike(source) else np.float64(parseNum(source))
+  return lambda t: np.broadcast_to(np.asarray(value)[..., None], np.shape(value) + t.shape)
+
+def _rcLadderModes(R_vals, C_vals):
+  # the modes of RC ladders R_vals, C_vals of shape (..., n_stages): the node voltages x obey
+  # C dx/dt = -G x + B u, so with z = sqrt(C) x, dz/dt = -S z + sqrt(C)^-1 B u for the symmetric
+  # S = sqrt(C)^-1 G sqrt(C)^-1 = V diag(lam) V^T. Each mode q = V^T z then obeys dq/dt = -lam q + beta u.
+  # Returns lam, the dc gain beta/lam of each mode, the modes to node voltages matrix and its inverse.
+  import numpy as np
+  g = 1 / R_vals
+  n = g.shape[-1]
+  idx = np.arange(n)
+  G = np.zeros(g.shape + (n,))
+  G[..., idx, idx] = g
+  G[..., idx[:-1], idx[:-1]] += g[..., 1:]
+  G[..., idx[:-1], idx[1:]] = G[..., idx[1:], idx[:-1]] = -g[..., 1:]
+  sqrt_C = np.sqrt(C_vals)
+  lam, V = np.linalg.eigh(G / (sqrt_C[..., :, None] * sqrt_C[..., None, :]))
+  beta = V[..., 0, :] * g[..., :1] / sqrt_C[..., :1]
+  return lam, beta / lam, V / sqrt_C[..., :, None], np.swapaxes(V, -1, -2) * sqrt_C[..., None, :]
+
+def _linearRecurrence(a, block=64):
+  # returns scan(f), which computes y[k] = a*y[k-1] + f[k] along the last axis of f (from y[-1] = 0) for
+  # the decays a (broadcast to f.shape[:-1]). Within each block of samples it's a product with the lower
+  # triangular matrix of a**(i-j) (made once here), then each block adds the carry from the previous
+  # ones, a**(i+1) * y at the end of the previous block, which is itself a scan, over blocks, by doubling.
+  import numpy as np
+  lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+  a = np.asarray(a)[..., None, None]
+  T_transposed = np.swapaxes(np.where(lag >= 0, a ** np.maximum(lag, 0), 0), -1, -2)
+  carry_powers = a[..., 0] ** np.arange(1, block + 1)
+  a_block = carry_powers[..., -1:]
+
+  def scan(f):
+    shape, L = f.shape[:-1], f.shape[-1]
+    n_blocks = -(-L // block)
+    if n_blocks * block > L: f = np.concatenate((f, np.zeros(shape + (n_blocks * block - L,))), axis=-1)
+    y = f.reshape(shape + (n_blocks, block)) @ T_transposed
+    ends, a_s, s = y[..., -1].copy(), a_block, 1
+    while s < n_blocks:
+      ends[..., s:] += a_s * ends[..., :-s]
+      a_s, s = a_s * a_s, s * 2
+    y[..., 1:, :] += ends[..., :-1, None] * carry_powers[..., None, :]
+    return y.reshape(shape + (n_blocks * block,))[..., :L]
+  return scan
+
+def rcTransient(R_vals, C_vals, source, dt, t_end=None, v0=0, chunk_size=4096, all_nodes=False):
+  '''rcTransient(R_vals, C_vals, source, dt, t_end=None, v0=0, chunk_size=4096, all_nodes=False)
+  a generator of (t, v) chunks of chunk_size samples (the last may be shorter) of the output voltage
+  of RC low-pass ladders every dt seconds from t=0 (where v is v0) to t_end (or forever if None).
+  R_vals and C_vals are numbers for a single RC, or arrays of shape (..., n_stages) for ladders of
+  n_stages (see the comments above pwlSource), where the leading axes are a batch of independent
+  circuits (e.g. R_vals of shape (n_voices, 1) for one RC per voice). source can be:
+    a number (a dc or step input), an array (one value per circuit), a function of time (taking an
+    array of times of shape (L,) and returning shape (L,) or (*batch, L)), a list of (t, v) points of a
+    piecewise linear source (see pwlSource) or a list of any of these, one per circuit.
+  v0 is the initial voltage of every capacitor (broadcast to (*batch, n_stages)). Time is the last axis
+  of v, which has shape (*batch, L), the voltage of the last node, or (*batch, n_stages, L), every
+  node's, with all_nodes=True.
+  Example (the envelopes of 256 voices with their own release times, a second at a time at 48kHz):
+    for t, v in rcTransient(np.full((256, 1), '10k'), C_per_voice[:, None], gate_sources, 1/48000, chunk_size=48000):
+      ...'''
+  import numpy as np
+  R_vals, C_vals = np.broadcast_arrays(parseMany(np.atleast_1d(R_vals)), parseMany(np.atleast_1d(C_vals)))
+  dt = parseNum(dt)
+  if dt <= 0: raise ValueError(f'dt must be positive (got {dt})')
+  n_samples = None if t_end is None else int(round(parseNum(t_end) / dt)) + 1
+  sample = _sourceSampler(source)
+
+  lam, gain, from_modes, to_modes = _rcLadderModes(R_vals, C_vals)
+  h = lam * dt
+  a = np.exp(-h)
+  one_minus_a = -np.expm1(-h)
+  gamma1 = 1 - one_minus_a / h  # of the input at the end of each step
+  gamma0 = one_minus_a - gamma1 # of the input at its start
+  gain0, gain1 = (gain * gamma0)[..., None], (gain * gamma1)[..., None]
+  if not all_nodes: from_modes = from_modes[..., -1:, :]
+  scan = _linearRecurrence(a)
+
+  u_prev, q, k0 = None, None, 0
+  while n_samples is None or k0 < n_samples:
+    L = chunk_size if n_samples is None else min(chunk_size, n_samples - k0)
+    t = (k0 + np.arange(L)) * dt
+    u = sample(t)
+    if u_prev is None: # the first sample is the initial state
+      batch_shape = np.broadcast_shapes(R_vals.shape[:-1], u.shape[:-1])
+      x0 = np.broadcast_to(parseMany(np.atleast_1d(v0)), batch_shape + R_vals.shape[-1:])
+      q = (to_modes @ x0[..., None])[..., 0]
+      u_prev, steps = u[..., 0], [q[..., None]]
+      u = u[..., 1:]
+    else: steps = []
+    if u.shape[-1]:
+      u_all = np.concatenate((np.broadcast_to(u_prev[..., None], u.shape[:-1] + (1,)), u), axis=-1)[..., None, :]
+      f = gain0 * u_all[..., :-1] + gain1 * u_all[..., 1:]
+      f = np.broadcast_to(f, batch_shape + f.shape[-2:]).copy() if f.shape[:-2] != batch_shape else f
+      f[..., 0] += a * q
+      steps.append(scan(f))
+      q, u_prev = steps[-1][..., -1], u[..., -1]
+    v = from_modes @ np.concatenate(steps, axis=-1)
+    yield t, (v if all_nodes else v[..., 0, :])
+    k0 += L
+
+
+#### FREQUENCY RESPONSE ###########################################################################
+
+# frequencyResponse compiles a transfer function (e.g. the gain of a resistor network) once, with the
+# symbols of any of its resistors that are capacitors replaced by their impedance, 1/(j*2*pi*f*C), and
+# evaluates it, and its derivative with respect to f (for the group delay), over whole arrays of
+# frequencies and component values at once.
+
+def _responseOf(freqs, H, dH_df):
+  # the dict returned by the frequency response functions, from H and dH/df at freqs (along the last axis)
+  import numpy as np
+  with np.errstate(divide='ignore', invalid='ignore'):
+    magnitude, phase = np.abs(H), np.angle(H)
+    return { 'freqs': freqs, 'H': H, 'magnitude': magnitude, 'magnitude_db': 20 * np.log10(magnitude),
+             'phase_deg': np.degrees(np.unwrap(phase, axis=-1) if np.ndim(phase) else phase),
+             'group_delay': -np.imag(dH_df / H) / (2 * np.pi) }
+
+@func_attr(maxsize=128, hits=0, misses=0, cache=OrderedDict())
+def _compiledResponse(h_expr, impedances):
+  # returns (func, others) where func(f, *capacitances, *others) returns (H, dH/df) for the transfer
+  # function h_expr with each of impedances replaced by a capacitor's impedance. The least recently
+  # used ones are dropped once there are more than _compiledResponse.maxsize of them.
+  key = (h_expr, impedances)
+  cache = _compiledResponse.cache
+  if key in cache:
+    _compiledResponse.hits += 1
+    cache.move_to_end(key)
+    return cache[key]
+  _compiledResponse.misses += 1
+  capacitances = [ sp.Dummy(f'C_{Z}') for Z in impedances ]
+  s = 2 * sp.pi * sp.I * f_Hz
+  H = h_expr.subs({ Z: 1 / (s * C_val) for Z, C_val in zip(impedances, capacitances) })
+  others = sorted(H.free_symbols - {f_Hz, *capacitances}, key=str)
+  func = sp.lambdify((f_Hz, *capacitances, *others), (H, H.diff(f_Hz)), modules='numpy')
+  cache[key] = (func, others)
+  while len(cache) > _compiledResponse.maxsize: cache.popitem(last=False)
+  return cache[key]
+
+def frequencyResponse(h_expr, freqs, capacitors={}, subs={}):
+  '''frequencyResponse(h_expr, freqs, capacitors={}, subs={})
+  evaluates the transfer function h_expr (an expression or the rhs of an equation, which can also be
+  in terms of f_Hz) at the frequencies freqs (Hz, e.g. np.logspace(1, 5, 400)), where capacitors maps
+  symbols in h_expr that are impedances to the capacitance of the capacitor there, e.g. {R_nfb: '10n'}
+  for an integrator, and subs has the values of its other symbols. Capacitances and values can be
+  arrays broadcast against freqs, e.g. of shape (n_variants, 1), to evaluate many variants at once.
+  Returns a dict of 'freqs', 'H' (complex), 'magnitude', 'magnitude_db', 'phase_deg' (unwrapped along
+  the last axis) and 'group_delay' (seconds, exactly -d(phase)/d(2*pi*f) from the derivative of H).
+  The compiled function is kept, so later calls with the same h_expr and capacitor symbols are only
+  the numpy evaluation.'''
+  import numpy as np
+  h_expr = h_expr.rhs if isinstance(h_expr, sp.Equality) else sp.sympify(h_expr)
+  impedances = tuple(capacitors)
+  func, others = _compiledResponse(h_expr, impedances)
+  missing = [ symb for symb in others if symb not in subs ]
+  if missing: raise ValueError(f'frequencyResponse needs values for {missing} in subs')
+  value = lambda val: parseMany(val) if _isArrayLike(val) else parseNum(val)
+  freqs = parseMany(freqs) if _isArrayLike(freqs) else np.float64(parseNum(freqs))
+  H, dH_df = func(freqs, *[ value(capacitors[Z]) for Z in impedances ], *[ value(subs[symb]) for symb in others ])
+  shape = np.broadcast_shapes(np.shape(H), np.shape(dH_df), np.shape(freqs))
+  H = np.broadcast_to(np.asarray(H, dtype=complex), shape)
+  dH_df = np.broadcast_to(np.asarray(dH_df, dtype=complex), shape)
+  return _responseOf(freqs, H, dH_df)
+
 #### MIDI NOTE FREQUENCY ##########################################################################
 
 
@@ -88,9 +341,46 @@ with sp.evaluate(False):
 semitone_up_ratio = 2**(sp.Rational(1, 12))
 semitone_down_ratio = 2**(sp.Rational(11, 12))/2
 
+# hzOfMidi, midiOfHz and periodOfMidi also take a list/tuple/array of notes (or frequencies), returning a
+# numpy array (float64, or object of sympy values with exact=True). For whole notes 0..127 the values come
+# from midiHzTable and with exact=True from a table of the exact sympy values, so sp.solve isn't called.
+
+midi_notes = range(128)
+
+@func_attr(cache={})
+def midiHzTable(resolution=1):
+  '''returns a numpy float64 array of the frequency of every MIDI note from 0 to 127 in steps of 
+  1/resolution of a semitone, i.e. midiHzTable()[69] == 440 and midiHzTable(100) is at cents resolution 
+  (midiHzTable(100)[6900] == 440). Built once per resolution and read-only.'''
+  import numpy as np
+  if resolution not in midiHzTable.cache:
+    notes = np.arange((len(midi_notes) - 1) * resolution + 1) / resolution
+    table = 440 * 2**((notes - 69)/12)
+    table.flags.writeable = False
+    midiHzTable.cache[resolution] = table
+  return midiHzTable.cache[resolution]
+
+@func_attr(cache={})
+def _exactHzOfMidi(note):
+  if note not in _exactHzOfMidi.cache: 
+    _exactHzOfMidi.cache[note] = 440 * 2**sp.Rational(note - 69, 12)
+  return _exactHzOfMidi.cache[note]
+
+def _isMidiNote(note):
+  return isinstance(note, int) and note in midi_notes
+
+
 def hzOfMidi(note, exact=False): 
+  if _isArrayLike(note):
+    import numpy as np
+    notes = np.asarray(note)
+    if exact: return np.frompyfunc(lambda n: hzOfMidi(n, True), 1, 1)(notes.astype(object))
+    if notes.dtype.kind in 'iu' and notes.size and notes.min() >= 0 and notes.max() < len(midi_notes):
+      return midiHzTable()[notes]
+    return 440 * 2**((notes.astype(float) - 69)/12)
   if exact:
-    sol = sp.solve(f_Hz_of_n_midi_eq.subs({n_midi: note}), f_Hz)
+    if _isMidiNote(note): return _exactHzOfMidi(note)
+    sol = cachedSolve(f_Hz_of_n_midi_eq.subs({n_midi: note}), f_Hz)
     if len(sol) == 1: return sol[0]
     else: return sol
   else:
@@ -98,8 +388,12 @@ def hzOfMidi(note, exact=False):
   
 
 def midiOfHz(hz, exact=False): 
+  if _isArrayLike(hz):
+    import numpy as np
+    if exact: return np.frompyfunc(lambda h: midiOfHz(h, True), 1, 1)(np.asarray(hz, dtype=object))
+    return 12 * np.log2(parseMany(hz) / 440) + 69
   if exact:
-    sol = sp.solve(n_midi_of_f_Hz_eq.subs({f_Hz: hz}), n_midi)
+    sol = cachedSolve(n_midi_of_f_Hz_eq.subs({f_Hz: hz}), n_midi)
     if len(sol) == 1: return sol[0]
     else: return sol
   else:
@@ -111,12 +405,29 @@ def periodOfMidi(note, exact=False, unit='s'):
   else: unit = getUnit(unit)
 
   hz = hzOfMidi(note, exact)
-
-  if hasattr(hz, '__len__') :
-    for i in range(len(hz)):
-      hz[i] = 1 / hz[i] / unit
-    return hz
-  else:
-    return 1 / hz / unit
+  return 1 / hz / unit # (elementwise for arrays)
 
 
+@func_attr(cache={})
+def nearestMidi(hz, resolution=1):
+  '''nearestMidi(hz, resolution=1)
+  quantizes each of hz (a number, a string that parseNum understands or a list/array of either) to the 
+  nearest MIDI note (nearest by ratio) from 0 to 127 in steps of 1/resolution of a semitone (resolution=100 
+  is cents). Returns a dict of 'note' (the quantized note number), 'hz' (its frequency) and 'cents' (how 
+  far hz is above it, in cents), each a float or an array of the same shape as hz. Frequencies beyond the 
+  range clip to note 0 or 127.
+  Examples:
+    nearestMidi(445)['note']                # 69.0 ('cents' is 19.56...)
+    nearestMidi([261.1, 446.0], 100)['note']  # array([59.97, 69.23])'''
+  import numpy as np
+  table = midiHzTable(resolution)
+  hz = parseMany(hz) if _isArrayLike(hz) else np.float64(parseNum(hz))
+  if resolution not in nearestMidi.cache: # (the midpoints are built once per resolution, like the table)
+    midpoints = np.sqrt(table[1:] * table[:-1]) # geometric, so the bins are nearest by ratio
+    midpoints.flags.writeable = False
+    nearestMidi.cache[resolution] = midpoints
+  midpoints = nearestMidi.cache[resolution]
+  i = np.searchsorted(midpoints, hz)
+  nearest = { 'note': i / resolution, 'hz': table[i], 'cents': 1200 * np.log2(hz / table[i]) }
+  if np.ndim(hz) == 0: nearest = { k: float(v) for k, v in nearest.items() }
+  return nearest
@@ -8,6 +8,8 @@ import sympy as sp
 from eeMath.eeSymbols import symbs
 
 from eeMath.general_helpers import func_attr
+from collections import OrderedDict
+from os import environ as _environ
 
 @func_attr(persist=False)
 def subs(expr_or_eq=None, subs_dict={}, persist=None):
@@ -43,7 +45,8 @@ def subs(expr_or_eq=None, subs_dict={}, persist=None):
     if expr_or_eq == 'clear':
       if subs_dict:
         if isinstance(subs_dict, dict):                 # clear, then set
-          symbs.subs = {**{symb:symb for symb in symbs.subs}, **subs_dict}
+          for symb in symbs.subs: symbs.subs[symb] = symb
+          symbs.subs.update(subs_dict)
           # also_include = subs_dict.keys() # we'll return those with defaults + those set
 
         elif isinstance(subs_dict, (set, list, tuple)): # clear specified only
@@ -52,12 +55,12 @@ def subs(expr_or_eq=None, subs_dict={}, persist=None):
 
         else: print(f'Warning: cannot clear defaults with {type(subs_dict)} object provided as second argument')
       else:
-        symbs.subs = { symb:symb for symb in symbs.subs }
+        for symb in symbs.subs: symbs.subs[symb] = symb
       
     elif expr_or_eq == 'set':
       if subs_dict:
         if isinstance(subs_dict, dict):              # set
-          symbs.subs = {**symbs.subs, **subs_dict}
+          symbs.subs.update(subs_dict)
           # also_include = subs_dict.keys() # we'll return those with defaults + those specified
 
         else: print(f'Warning: cannot set defaults using {type(subs_dict)} object')
@@ -82,7 +85,7 @@ def subs(expr_or_eq=None, subs_dict={}, persist=None):
   result = expr_or_eq.subs(merged_subs)
 
   if subs.persist:
-    symbs.subs = {**symbs.subs, **subs_dict}
+    symbs.subs.update(subs_dict)
   return result
 
 #....... Boolean functions ...................................................
@@ -95,11 +98,108 @@ def equalExprs(*exprs):
 
 #....... solve, calc ..........................................................
 
-def solveFor(eq, solve_for, multiple_solutions='allow'):
+#....... solve cache ...........................................................
+
+# sp.solve results are memoized by a hash of the srepr of the equations, the symbols solved for, the flags
+# and the sympy version. There are two tiers: an in-memory LRU (cachedSolve.maxsize entries) and, if
+# cachedSolve.disk_dir is set (or EEMATH_SOLVE_CACHE=/some/dir before import), a directory of pickles
+# shared between processes/runs, trimmed (least recently used first) to cachedSolve.disk_maxbytes.
+# Results are stored on disk as srepr strings (keeping the args order, order='none') for the same reason
+# as in eq_cache.py, so a disk hit is equal (==, hash and .args) to the memory hit and to a fresh solve.
+
+def _copySolution(sol):
+  # sp.solve returns lists/dicts that callers (e.g. solveFor) modify, so never hand out the cached one
+  if isinstance(sol, dict): return dict(sol)
+  if isinstance(sol, list): return [ _copySolution(el) for el in sol ]
+  return sol
+
+def _solveCacheFile(key):
+  from pathlib import Path
+  return Path(cachedSolve.disk_dir) / f'solve.{key}.pickle'
+
+def _readSolution(key):
+  from os import utime
+  from pickle import load
+  path = _solveCacheFile(key)
+  try:
+    with open(path, 'rb') as f: srepr_str = load(f)
+    with sp.evaluate(False): sol = eval(srepr_str, vars(sp))
+    utime(path) # bump for the least recently used trimming
+    return sol
+  except Exception: return None # missing or unreadable: solve
+
+def _writeSolution(key, sol):
+  from os import replace, getpid
+  from pickle import dump, HIGHEST_PROTOCOL
+  path = _solveCacheFile(key)
+  tmp_path = path.with_name(f'{path.name}.{getpid()}.tmp')
+  try:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, 'wb') as f: dump(sp.srepr(sol, order='none'), f, HIGHEST_PROTOCOL)
+    replace(tmp_path, path) # atomic so concurrent runs never read a partial file
+    files = sorted( ((f.stat().st_mtime, f.stat().st_size, f) for f in path.parent.glob('solve.*.pickle')),
+                    key=lambda t: t[0] )
+    total = sum(size for _, size, _ in files)
+    for _, size, f in files:
+      if total <= cachedSolve.disk_maxbytes: break
+      f.unlink(missing_ok=True)
+      total -= size
+  except OSError: pass # e.g. read-only dir: memory tier only
+
+def _clearSolveDisk():
+  from pathlib import Path
+  if cachedSolve.disk_dir:
+    for f in Path(cachedSolve.disk_dir).glob('solve.*.pickle'): f.unlink(missing_ok=True)
+
+
+@func_attr(enabled=True, maxsize=512, hits=0, disk_hits=0, misses=0, cache=OrderedDict(),
+           disk_dir=_environ.get('EEMATH_SOLVE_CACHE') or None, disk_maxbytes=64*2**20)
+def cachedSolve(eqs, symbols, cache=True, **flags):
+  '''cachedSolve(eqs, symbols, cache=True, **flags)
+  Same as sp.solve(eqs, symbols, **flags) but the result is looked up in (or added to) the solve cache
+  described above. Pass cache=False (or set cachedSolve.enabled = False) to call sp.solve directly.
+  See solveCacheInfo() for hit/miss counts.'''
+  if not (cache and cachedSolve.enabled): return sp.solve(eqs, symbols, **flags)
+  from hashlib import sha256
+  key = sha256( '\n'.join(( sp.__version__, sp.srepr(eqs), sp.srepr(symbols),
+                            repr(sorted(flags.items())) )).encode() ).hexdigest()
+  mem = cachedSolve.cache
+  if key in mem:
+    cachedSolve.hits += 1
+    mem.move_to_end(key)
+    return _copySolution(mem[key])
+
+  sol = _readSolution(key) if cachedSolve.disk_dir else None
+  if sol is not None: cachedSolve.disk_hits += 1
+  else:
+    cachedSolve.misses += 1
+    sol = sp.solve(eqs, symbols, **flags)
+    if cachedSolve.disk_dir: _writeSolution(key, sol)
+
+  mem[key] = sol
+  while len(mem) > cachedSolve.maxsize: mem.popitem(last=False)
+  return _copySolution(sol)
+
+def solveCacheInfo(clear=False):
+  '''returns dict of hits (memory), disk_hits, misses, size, maxsize, disk_dir and disk_maxbytes of the
+  solve cache. If clear=True, the memory tier is emptied and the counters are reset (after getting the
+  returned info). If clear='disk', the cache files in cachedSolve.disk_dir are deleted as well.'''
+  info = { 'hits': cachedSolve.hits, 'disk_hits': cachedSolve.disk_hits, 'misses': cachedSolve.misses,
+           'size': len(cachedSolve.cache), 'maxsize': cachedSolve.maxsize,
+           'disk_dir': cachedSolve.disk_dir, 'disk_maxbytes': cachedSolve.disk_maxbytes }
+  if clear:
+    cachedSolve.cache.clear()
+    cachedSolve.hits = cachedSolve.disk_hits = cachedSolve.misses = 0
+    if clear == 'disk': _clearSolveDisk()
+  return info
+
+
+def solveFor(eq, solve_for, multiple_solutions='allow', cache=True):
   # multiple_solution ='first'|'fail'|'expect'|'allow' which mean:
   # return first (never array) | fail (never return array) | always return array | return array if multiple
   # in all cases, an empty array is returned if there are no solutions
-  solutions = sp.solve(eq, solve_for)
+  # cache=False bypasses the solve cache (see cachedSolve)
+  solutions = cachedSolve(eq, solve_for, cache=cache)
   if   len(solutions) == 1:
     if multiple_solutions == 'expect': return [sp.Eq(solve_for, solutions[0])]
     else: return sp.Eq(solve_for, solutions[0])
@@ -118,7 +218,7 @@ def solveSys(eqs_or_exprs, *symbs, **flags):
   # normally sp.solve would return a dict of symbol values but this function 
   # will return a tuple of those values in the order they were passed to 
   # symbs. If there is than one solution, the return is a list of these tuples
-  # Also, unlike sp.solve, evalf=True can be passed
+  # Also, unlike sp.solve, evalf=True can be passed, as can cache=False to bypass the solve cache
 
   '''example with one solution:
   from sympy.abc import x, y, z
@@ -134,6 +234,7 @@ def solveSys(eqs_or_exprs, *symbs, **flags):
   if 'evalf' in flags:
     try_eval = flags['evalf']
     del flags['evalf']
+  cache = flags.pop('cache', True)
 
   from collections.abc import Iterable
   if not isinstance(eqs_or_exprs, Iterable): eqs_or_exprs = [eqs_or_exprs]
@@ -141,7 +242,7 @@ def solveSys(eqs_or_exprs, *symbs, **flags):
   if len(symbs) == 1:
     symbs = symbs[0] if isinstance(symbs[0], Iterable) else [symbs[0]]
 
-  sol = sp.solve(eqs_or_exprs, symbs)
+  sol = cachedSolve(eqs_or_exprs, symbs, cache=cache, **flags)
 
   if isinstance(sol, dict):
     if try_eval: return tuple([evalF(sol[symb]) for symb in symbs])
@@ -154,6 +255,177 @@ def solveSys(eqs_or_exprs, *symbs, **flags):
     return sol
 
 
+#....... parameter sweeps ......................................................
+
+@func_attr(target=None, solve_for=())
+def _sweepInit(target, solve_for_srepr):
+  # runs once per worker process (or once in this one when serial), so target is rebuilt only once.
+  # Equations come as a srepr string and are rebuilt under evaluate(False), as in eq_cache.py, since
+  # unpickling would re-evaluate them. An object with a solve method comes pickled (OpampConfig pickles
+  # itself as the srepr of its arguments, see OpampConfig.__reduce__)
+  namespace = vars(sp)
+  with sp.evaluate(False):
+    if isinstance(target, str): target = eval(target, namespace)
+    solve_for = eval(solve_for_srepr, namespace)
+  _sweepInit.target, _sweepInit.solve_for = target, solve_for
+
+def _sweepChunk(points):
+  target, solve_for = _sweepInit.target, _sweepInit.solve_for
+  results = []
+  for point in points:
+    if hasattr(target, 'solve'): results.append(target.solve(*solve_for, subs=point)) # e.g. OpampConfig
+    else:
+      subbed = [ eq.subs(point) for eq in target ]
+      symbols = solve_for or sorted(set().union(*(eq.free_symbols for eq in subbed)), key=str)
+      results.append(solveSys(subbed, list(symbols)))
+  return results
+
+def sweepGrid(grid):
+  '''sweepGrid(grid) returns a list of subs dicts: every combination (the last symbol varying fastest)
+  of grid's {symbol: values} if it's a dict, otherwise grid itself (already an iterable of subs dicts)'''
+  if not isinstance(grid, dict): return [ dict(point) for point in grid ]
+  from itertools import product
+  return [ dict(zip(grid, values)) for values in product(*grid.values()) ]
+
+def sweepSolve(eq_or_config, grid, *solve_for, workers=None, chunksize=None, progress=None):
+  '''sweepSolve(eq_or_config, grid, *solve_for, workers=None, chunksize=None, progress=None)
+  a generator of (point, solution) for each point (a subs dict) of grid (see sweepGrid), in order,
+  solving each point in a pool of worker processes. eq_or_config can be:
+    an equation/expression (or a list of them): the solution is solveSys(eqs.subs(point), solve_for)
+      (solve_for defaults to every symbol left after the subs), or
+    an object with a solve method, like OpampConfig: the solution is eq_or_config.solve(*solve_for, subs=point)
+  eq_or_config is sent once per worker, not once per point (equations as srepr strings). Points are sent to the workers
+  chunksize at a time (default: enough for about 4 chunks per worker) with at most 2 chunks per worker
+  queued ahead of the results consumed so far. workers defaults to one per cpu; workers=1 solves in
+  this process (no pool).
+  progress, if passed, is called as progress(points_done, points_total) after each chunk is yielded.
+  Cancel the sweep by returning False from progress or by closing the generator (i.e. breaking out of
+  a for loop over it): the chunks not started yet are cancelled.
+  Example:
+    for point, sol in sweepSolve(vdiv_out_eq, {v_in: [5, 10], R_GND: [1e3, 2e3]}, R_IN):
+      print(point, sol)'''
+  from os import cpu_count
+  from collections import deque
+  points = sweepGrid(grid)
+  target = eq_or_config if hasattr(eq_or_config, 'solve') else sp.srepr(
+    list(eq_or_config) if isinstance(eq_or_config, (list, tuple)) else [eq_or_config] )
+  workers = workers or cpu_count() or 1
+  chunksize = chunksize or max(1, -(-len(points) // (workers * 4)))
+  chunks = ( points[i : i + chunksize] for i in range(0, len(points), chunksize) )
+  done = 0
+
+  if workers == 1:
+    _sweepInit(target, sp.srepr(solve_for))
+    for chunk in chunks:
+      yield from zip(chunk, _sweepChunk(chunk))
+      done += len(chunk)
+      if progress is not None and progress(done, len(points)) is False: return
+    return
+
+  from concurrent.futures import ProcessPoolExecutor
+  pool = ProcessPoolExecutor(max_workers=workers, initializer=_sweepInit, initargs=(target, sp.srepr(solve_for)))
+  pending = deque()
+  try:
+    for chunk in chunks: # keep up to 2 chunks per worker in flight, consuming results in order
+      pending.append((chunk, pool.submit(_sweepChunk, chunk)))
+      while len(pending) >= workers * 2 or (pending and pending[0][1].done()):
+        chunk_done, future = pending.popleft()
+        yield from zip(chunk_done, future.result())
+        done += len(chunk_done)
+        if progress is not None and progress(done, len(points)) is False: return
+    while pending:
+      chunk_done, future = pending.popleft()
+      yield from zip(chunk_done, future.result())
+      done += len(chunk_done)
+      if progress is not None and progress(done, len(points)) is False: return
+  finally: # also runs when the generator is closed early
+    pool.shutdown(wait=False, cancel_futures=True)
+
+#....... nonlinear solve .......................................................
+
+@func_attr(cache={})
+def _newtonFuncs(residuals, unknowns):
+  # returns (F, J, params): the residuals and their jacobian (derived once per residuals and unknowns)
+  # compiled with numpy as functions of (*unknowns, *params), each returning a list of their entries
+  key = (residuals, unknowns)
+  if key not in _newtonFuncs.cache:
+    params = sorted(set().union(*(r.free_symbols for r in residuals)) - set(unknowns), key=str)
+    jacobian = sp.Matrix(residuals).jacobian(unknowns)
+    args = (*unknowns, *params)
+    F = sp.lambdify(args, list(residuals), modules='numpy', cse=True)
+    J = sp.lambdify(args, list(jacobian), modules='numpy', cse=True)
+    _newtonFuncs.cache[key] = (F, J, params)
+  return _newtonFuncs.cache[key]
+
+def newtonSolve(residuals, unknowns, guess, subs={}, max_step={}, xtol=1e-12, ftol=1e-9, max_iter=100, max_halvings=10):
+  '''newtonSolve(residuals, unknowns, guess, subs={}, max_step={}, xtol=1e-12, ftol=1e-9, max_iter=100, max_halvings=10)
+  numerically solves residuals (expressions that are zero at the solution, or equations) for the symbols
+  unknowns by a damped Newton's method, where the jacobian is derived, and compiled with numpy along with
+  the residuals, once per residuals and unknowns. guess has a starting value for each unknown and subs
+  a value for every other symbol, and any of them can be arrays (broadcast together) to solve a batch of
+  problems, e.g. thousands of operating points, at once. In each iteration, the step of any unknown in
+  max_step (e.g. a junction voltage) is limited to its value there, then the step is halved (up to
+  max_halvings times) while it doesn't reduce the sum of the squares of the residuals. A problem has
+  converged once its step is within xtol * max(1, |value|) for every unknown and the root of the sum of
+  the squares of its residuals is within ftol. Where the jacobian is singular the step is taken with its
+  pseudo-inverse, which never counts as converged, and a problem whose step is zero stops there, unconverged.
+  Returns a dict of each unknown: its value(s), 'converged' (a bool, or array of them) and 'iterations'.
+  Example (a 1N4148 fed from 5V through 1k):
+    newtonSolve([5 - 1000*i_D_shockley_eq.rhs - v_D], [v_D], {v_D: 0.6}, {I_S: 4.35e-9, n_D: 1.906, V_T: 0.0259},
+                max_step={v_D: 0.1})'''
+  import numpy as np
+  from eeMath.units import parseNum, parseMany
+  residuals = tuple( r.lhs - r.rhs if isinstance(r, sp.Equality) else sp.sympify(r) for r in residuals )
+  unknowns = tuple(unknowns)
+  F, J, params = _newtonFuncs(residuals, unknowns)
+  missing = [ symb for symb in params if symb not in subs ]
+  if missing: raise ValueError(f'newtonSolve needs values for {missing} in subs')
+  value = lambda val: parseMany(val) if np.ndim(val) else float(parseNum(val))
+  param_vals = [ value(subs[symb]) for symb in params ]
+  x = [ value(guess[symb]) for symb in unknowns ]
+  shape = np.broadcast_shapes(*(np.shape(val) for val in (*x, *param_vals)))
+  n = len(unknowns)
+  x = np.stack([ np.broadcast_to(val, shape) for val in x ], axis=-1).astype(float)
+  limit = np.array([ float(parseNum(max_step[symb])) if symb in max_step else np.inf for symb in unknowns ])
+
+  entries = lambda func, x: np.stack([ np.broadcast_to(entry, shape) for entry in func(*np.moveaxis(x, -1, 0), *param_vals) ], axis=-1)
+  fx = entries(F, x)
+  merit = (fx**2).sum(axis=-1)
+  converged = np.zeros(shape, dtype=bool)
+  done = np.zeros(shape, dtype=bool) # converged, or stuck (a zero step)
+  iterations = 0
+  with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+    while iterations < max_iter and not done.all():
+      iterations += 1
+      jac = entries(J, x).reshape(shape + (n, n))
+      singular = np.zeros(shape, dtype=bool)
+      try: step = np.linalg.solve(jac, -fx[..., None])[..., 0]
+      except np.linalg.LinAlgError: # only the singular problems get the (slower) pseudo-inverse
+        singular = np.linalg.det(jac) == 0
+        step = np.linalg.solve(np.where(singular[..., None, None], np.eye(n), jac), -fx[..., None])[..., 0]
+        step[singular] = (np.linalg.pinv(jac[singular]) @ -fx[singular][..., None])[..., 0]
+      step = np.where(done[..., None], 0, np.clip(step, -limit, limit))
+      damping = np.ones(shape)
+      for _ in range(max_halvings + 1):
+        x_new = x + damping[..., None] * step
+        f_new = entries(F, x_new)
+        merit_new = (f_new**2).sum(axis=-1)
+        worse = ~done & ~(merit_new <= merit)
+        if not worse.any(): break
+        damping = np.where(worse, damping / 2, damping)
+      accept = np.isfinite(merit_new) # (otherwise the problem keeps its last x, and doesn't converge)
+      x = np.where(accept[..., None], x_new, x)
+      fx = np.where(accept[..., None], f_new, fx)
+      merit = np.where(accept, merit_new, merit)
+      small_step = (np.abs(step) <= xtol * np.maximum(1, np.abs(x))).all(axis=-1)
+      converged |= ~done & accept & ~singular & small_step & (merit <= ftol**2)
+      done |= converged | (step == 0).all(axis=-1)
+
+  result = { symb: (x[..., i] if shape else float(x[..., i])) for i, symb in enumerate(unknowns) }
+  result.update(converged=converged if shape else bool(converged), iterations=iterations)
+  return result
+
+
 def evalF(anything, exact=True, try_mixed=False, max_decimals=10):
   # TODO: maybe see if there is precision loss and avoid it by not .evalf in that case
   # UPDATE: DONE.
@@ -244,7 +516,8 @@ def floatDecimalPlaces(flt):
 
 #....... compatibility ........................................................
 
-def lambdifier(expr_or_eq, *required_symbol_args, **symbol_with_defaults):
+@func_attr(maxsize=256, hits=0, misses=0, cache=OrderedDict())
+def lambdifier(expr_or_eq, *required_symbol_args, backend=None, **symbol_with_defaults):
   '''
   like sympy.lamdify but...
   1) arg1: is exprssion or, if equality, uses the right hand expression:
@@ -253,6 +526,13 @@ def lambdifier(expr_or_eq, *required_symbol_args, **symbol_with_defaults):
       do not have default values
   3) additional kwargs in the form of symbol=default_value are used to define the 
       remaining lamdified function's arguments with default values that are, therefore, optional
+  4) backend (keyword only) is passed to sympy.lambdify as `modules`. The default (None) is sympy's 
+      default (numpy if installed). Pass backend='numpy' to be sure the returned function accepts 
+      whole numpy arrays for any argument (and broadcasts them), or 'math' for plain python floats.
+  The returned functions are memoized: calling lambdifier again with the same expression, arguments,
+  defaults and backend returns the function compiled the first time instead of generating it again.
+  The least recently used function is dropped once there are more than lambdifier.maxsize of them.
+  See lambdifierCacheInfo() for hit/miss counts.
   '''
   expr = expr_or_eq.rhs if expr_or_eq.is_Equality else expr_or_eq
   symbol_args = list(required_symbol_args) # a tuple
@@ -260,8 +540,35 @@ def lambdifier(expr_or_eq, *required_symbol_args, **symbol_with_defaults):
     symbol_args.append(f'{symb}={value}')
     # symbol_args += (f'{symb}={value}', ) # DON'T REMOVE COMMA: 
     # # see first comment to https://stackoverflow.com/a/8538676
+
+  key = (
+    sp.srepr(expr),
+    tuple(sp.srepr(arg) if isinstance(arg, sp.Basic) else str(arg) for arg in symbol_args),
+    backend if isinstance(backend, str) or backend is None else repr(backend)
+  )
+  cache = lambdifier.cache
+  if key in cache:
+    lambdifier.hits += 1
+    cache.move_to_end(key)
+    return cache[key]
+
+  lambdifier.misses += 1
   # return sp.lambdify(tuple(symbol_args), expr)
-  return sp.lambdify(tuple(symbol_args), expr)
+  func = sp.lambdify(tuple(symbol_args), expr, modules=backend)
+  cache[key] = func
+  while len(cache) > lambdifier.maxsize: cache.popitem(last=False)
+  return func
+
+def lambdifierCacheInfo(clear=False):
+  '''returns dict of hits, misses, size and maxsize of the lambdifier memo cache.
+  If clear=True, the cache is emptied and the counters are reset (after getting the returned info).
+  To change the maximum number of compiled functions kept: lambdifier.maxsize = n'''
+  info = { 'hits': lambdifier.hits, 'misses': lambdifier.misses, 
+          'size': len(lambdifier.cache), 'maxsize': lambdifier.maxsize }
+  if clear:
+    lambdifier.cache.clear()
+    lambdifier.hits = lambdifier.misses = 0
+  return info
 
 #....... display of information ...............................................
 
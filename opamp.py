@@ -4,9 +4,17 @@ from sympy import Eq, evaluate, simplify
 from eeMath.eeSymbols import getSymb, real_finite, real_nonneg
 from eeMath.eeSymbols import v_p, v_p, v_m, v_out, R_v_m, R_nfb, R_pfb, v_in, i_out, v_pIn, v_offset, v_gain, V_REF,R_GND, R_v_p, R_pREF, R_nREF, V_pREF, V_nREF, v_p_gain, v_m_gain
 from eeMath.eeFundamentals import vRJunct, vDivExpr
+from eeMath.eq_cache import cachedEqs
+from eeMath.general_helpers import func_attr
+from eeMath.math_helpers import cachedSolve, lambdifier
+from eeMath.freq_and_time import frequencyResponse
 
 
-opamp_nfb_v_out_expr = simplify( v_p + (v_p - v_m) * R_nfb/R_v_m )
+def _simplifiedEqs(): # built once, then loaded from the equation cache (see eq_cache.py)
+  opamp_nfb_v_out_expr = simplify( v_p + (v_p - v_m) * R_nfb/R_v_m )
+  return { 'opamp_nfb_v_out_expr': opamp_nfb_v_out_expr }
+
+opamp_nfb_v_out_expr = cachedEqs('opamp_nfb', _simplifiedEqs)['opamp_nfb_v_out_expr']
 opamp_nfb_v_out_eq = Eq(v_out, opamp_nfb_v_out_expr)
 
 with evaluate(False):
@@ -20,16 +28,45 @@ with evaluate(False):
   opamp_noninv_v_gain_eq = Eq(v_gain, (R_nfb + R_v_m)/R_v_m)
   opamp_noninv_v_offset_eq = Eq(v_offset, -V_nREF * (R_nfb/R_v_m))
   opamp_noninv_v_out_of_offset_gain_eq = Eq(v_out, v_p * ( v_gain ) + v_offset)
-  opamp_noninv_v_out_eq = opamp_noninv_v_out_of_offset_gain_eq.subs({
-    v_gain: opamp_noninv_v_gain_eq.rhs,
-    v_offset: opamp_noninv_v_offset_eq.rhs
-  })
+
+def _noninvEqs(): # built once, then loaded from the equation cache (see eq_cache.py)
+  with evaluate(False):
+    return {
+      'opamp_noninv_v_out_eq': opamp_noninv_v_out_of_offset_gain_eq.subs({
+        v_gain: opamp_noninv_v_gain_eq.rhs,
+        v_offset: opamp_noninv_v_offset_eq.rhs
+      })
+    }
+
+opamp_noninv_v_out_eq = cachedEqs('opamp_noninv', _noninvEqs)['opamp_noninv_v_out_eq']
 
 def opampNoninvGainAndOffset(sym_subs: dict(V_REF=None, R_v_m=None, R_nfb=None) ):
   return opamp_noninv_v_gain_eq.rhs.subs(sym_subs), opamp_noninv_v_offset_eq.rhs.subs(sym_subs)
 
 
 
+def _junctionExpr(v_R_pairs):
+  # the voltage at the junction of resistors R_i from voltages v_i: sum(v_i/R_i) / sum(1/R_i), with both
+  # multiplied by the product of all R_i, i.e. sum(v_i * prod(R_j, j != i)) / sum(prod(R_j, j != i))
+  Rs = [ R for _, R in v_R_pairs ]
+  R_prods = [ sp.Mul(*Rs[:i], *Rs[i+1:]) for i in range(len(Rs)) ]
+  return sp.Add(*[ v * R_prod for (v, _), R_prod in zip(v_R_pairs, R_prods) ]) / sp.Add(*R_prods)
+
+def _opampNfbEqs(v_p, v_m, v_out, R_nfb, vp_Rp_pairs, vm_Rm_pairs):
+  # the closed forms opampNfbBuilder used to get from simplify and sp.solve, built directly:
+  # KCL at v_m, (v_out - v_m)/R_nfb + sum((v_mi - v_m)/R_mi) = 0, gives
+  # v_out = v_m + R_nfb * sum((v_m - v_mi)/R_mi), multiplied through by the product of all R_mi
+  Rs = [ R for _, R in vm_Rm_pairs ]
+  R_prods = [ sp.Mul(*Rs[:i], *Rs[i+1:]) for i in range(len(Rs)) ]
+  v_out_numerator = sp.Add( v_m * sp.Mul(*Rs), *[ R_nfb * R_prod * v_m for R_prod in R_prods ],
+                            *[ -R_nfb * R_prod * v_mi for (v_mi, _), R_prod in zip(vm_Rm_pairs, R_prods) ] )
+  return {
+    v_out: Eq(v_out, v_out_numerator / sp.Mul(*Rs)),
+    v_p: Eq(v_p, _junctionExpr(vp_Rp_pairs)) if vp_Rp_pairs else sp.true, # (as simplify(Eq(v_p, v_p)))
+    v_m: Eq(v_m, _junctionExpr([(v_out, R_nfb), *vm_Rm_pairs])),
+  }
+
+@func_attr(cache={})
 def opampNfbBuilder(v_m_count=1, v_p_count=1, as_tuple=False, quiet=False):
   ''' opampNfbBuilder builds a set of equalities for a an op-amp with negative feedback by
   taking two numbers: 
@@ -79,13 +116,17 @@ def opampNfbBuilder(v_m_count=1, v_p_count=1, as_tuple=False, quiet=False):
   }
 
   Since this function might creates new symbols, the above dictionary catalogs them such that you can 
-  create variable to reference them. '''
+  create variable to reference them. 
+
+  The equations are built directly (not solved for) and kept per v_m_count, v_p_count and symbols, so 
+  dozens of inputs are fine and repeated calls only look the symbols up. '''
 
   if v_m_count == 'help':
     print(opampNfbBuilder.__doc__)
     return
   elif v_m_count == '__doc__':
     return opampNfbBuilder.__doc__
+  if v_p_count < 1: raise ValueError(f'v_p_count must be at least 1 ({v_p_count} given)')
 
   v_p, v_p_was_new     = getSymb(f'v_p', create='inform', about=f"opamp's non-inverting input voltage", **real_finite)
   v_m, v_m_was_new     = getSymb(f'v_m', create='inform', about=f"opamp's inverting input voltage", **real_finite)
@@ -113,16 +154,12 @@ def opampNfbBuilder(v_m_count=1, v_p_count=1, as_tuple=False, quiet=False):
 
   registerSymb((v_p,'v_p',v_p_was_new), (v_m,'v_m',v_m_was_new), (v_out,'v_out',v_out_was_new), (R_nfb,'R_nfb',R_nfb_was_new))
   
-  if v_p_count == 1: r[v_p] = simplify(Eq(v_p, v_p))
-
-  else:
+  if v_p_count > 1:
     for i in range(1, v_p_count+1) :
       v_symb, v_was_new = getSymb(f'v_p{i}', create='inform', about=f'v_p{i} (this symbol) -> R_p{i} -> v_p (opamp input)', **real_finite)
       r_symb, r_was_new = getSymb(f'R_p{i}', create='inform', about=f'v_p{i} -> R_p{i} (this symbol) -> v_p (opamp input)', **real_nonneg)
       registerSymb((v_symb, f'v_p{i}', v_was_new), (r_symb, f'R_p{i}', r_was_new))
       vp_Rp_pairs.append( (v_symb, r_symb) )
-
-    r[v_p] = simplify(Eq(v_p, vRJunct( *vp_Rp_pairs ) ))
   
   for i in range(1, v_m_count+1) :
     v_symb, v_was_new = getSymb(f'v_m{i}', create='inform', about=f'v_m{i} (this symbol) -> R_m{i} -> v_m (opamp input)', **real_finite)
@@ -130,13 +167,12 @@ def opampNfbBuilder(v_m_count=1, v_p_count=1, as_tuple=False, quiet=False):
     
     vm_Rm_pairs.append( (v_symb, r_symb) )
     registerSymb((v_symb, f'v_m{i}', v_was_new), (r_symb, f'R_m{i}', r_was_new))
-  
-  r[v_m] = simplify(Eq(v_m, vRJunct( *vm_Rm_pairs ) ))
 
-  v_out_solved = sp.solve([Eq(v_p, v_m), r[v_m], r[v_p]], v_out)
-  if isinstance(v_out_solved, dict) :
-    for k in v_out_solved: r[k] = Eq(k, v_out_solved[k])
-  else: r[v_out] = v_out_solved
+  # the equations only depend on the counts and the symbols (which are the same unless redeclared)
+  key = (v_m_count, v_p_count, v_p, v_m, *vp_Rp_pairs, *vm_Rm_pairs)
+  if key not in opampNfbBuilder.cache:
+    opampNfbBuilder.cache[key] = _opampNfbEqs(v_p, v_m, v_out, R_nfb, vp_Rp_pairs, vm_Rm_pairs[1:])
+  r.update(opampNfbBuilder.cache[key])
 
   return (r[v_out], r[v_p], r[v_m], r['created'], r['global']) if as_tuple else r
 
@@ -184,6 +220,12 @@ class OpampConfig:
     self._subs = subs.copy()
     self._in_symb = in_symb
     self._out_symb = out_symb
+    self._closed_forms = {} # (out_symb, in_symb): closed form dict (see _closedForm), cleared by the setters
+
+  def __reduce__(self):
+    # pickled (e.g. for sweepSolve's worker processes) as the srepr of the arguments, rather than as sympy
+    # objects (which unpickling re-evaluates) and the closed forms (whose compiled functions can't be pickled)
+    return (_opampConfigFromSrepr, (sp.srepr((self._v_p, self._v_m, self._subs, self._in_symb, self._out_symb)),))
     
   def solve(self, *solve_for, subs={}):
     '''
@@ -193,6 +235,9 @@ class OpampConfig:
     # from collections.abc import Iterable
     # if len(solve_for) == 1:
     #   solve_for = solve_for[0] if isinstance(solve_for[0], Iterable) else [solve_for[0]]
+    if solve_for in ((), (self._out_symb,)) and self._canUseClosedForm(subs):
+      out = self._closedForm(self._out_symb, self._in_symb)['expr'].subs(subs)
+      if not out.has(sp.nan, sp.zoo, sp.oo, -sp.oo): return out
     subbed_eq = self._eq.subs(self._subs | subs)
 
     if len(solve_for) == 1 and solve_for[0] == 'all':
@@ -200,7 +245,7 @@ class OpampConfig:
     else:
       if len(solve_for) == 0: solve_for = (self._out_symb,) # default to solve for output voltage
     
-    sol = sp.solve(subbed_eq, solve_for)
+    sol = cachedSolve(subbed_eq, solve_for)
 
     if len(sol) == 1: return sol[0]
     else: return sol
@@ -224,10 +269,15 @@ class OpampConfig:
     req2_eq = Eq(vout2, vout2_expr)
 
     free_symbols = req1_eq.free_symbols.union(req2_eq.free_symbols)
-    return sp.solve([req1_eq, req2_eq], list(free_symbols))
+    return cachedSolve([req1_eq, req2_eq], list(free_symbols))
 
 
   def gainAndZeroOffset(self, subs={}, offset_at=0):
+    if self._canUseClosedForm(subs):
+      closed = self._closedForm(self._out_symb, self._in_symb)
+      offset = closed['offset'] if offset_at == 0 else closed['expr'].subs(self._in_symb, offset_at)
+      gain_and_offset = { 'gain': closed['gain'].subs(subs), 'offset': offset.subs(subs) }
+      if not any(value.has(sp.nan, sp.zoo, sp.oo, -sp.oo) for value in gain_and_offset.values()): return gain_and_offset
     subbed = self._eq.subs(self._subs | subs)
     
     # free_symbols = subbed.free_symbols
@@ -244,6 +294,73 @@ class OpampConfig:
     else: offset = self.solve(self._out_symb, subs={self._in_symb: offset_at, **subs})
       
     return { 'gain': out_with_one_in - out_with_zero_in, 'offset': offset }
+
+  def compile(self, out_symb=None, in_symb=None):
+    '''returns a function, transfer(v_in, subs={}), of the closed form of out_symb (default self.out_symb) 
+    in terms of in_symb (default self.in_symb) with self.subs substituted, compiled with numpy so v_in can be
+    an array. subs must have a value (or array) for any other symbols left in the closed form.
+    The function also has these (exact, sympy) attributes: expr (the closed form), gain (its derivative with 
+    respect to in_symb), offset (its value when in_symb is 0) and symbols (in_symb then the others, in order).
+    The closed form is solved for once and kept until v_p, v_m or subs change (through their setters,
+    subsAdd or unsub). solve, gainAndZeroOffset and solveForCoords use it too.'''
+    import numpy as np
+    out_symb = self._out_symb if out_symb is None else out_symb
+    in_symb = self._in_symb if in_symb is None else in_symb
+    closed = self._closedForm(out_symb, in_symb)
+    if 'transfer' not in closed:
+      others = sorted(closed['expr'].free_symbols - {in_symb}, key=str)
+      func = lambdifier(closed['expr'], in_symb, *others, backend='numpy')
+      def transfer(v_in, subs={}):
+        missing = [ symb for symb in others if symb not in subs ]
+        if missing: raise ValueError(f'transfer needs values for {missing} in subs')
+        v_out = func(v_in, *[ subs[symb] for symb in others ])
+        return v_out if np.shape(v_out) == np.shape(v_in) else np.broadcast_to(v_out, np.shape(v_in))
+      transfer.expr, transfer.gain, transfer.offset = closed['expr'], closed['gain'], closed['offset']
+      transfer.symbols = (in_symb, *others)
+      closed['transfer'] = transfer
+    return closed['transfer']
+
+  def frequencyResponse(self, freqs, capacitors={}, subs={}, out_symb=None, in_symb=None):
+    '''returns the frequency response (see freq_and_time.frequencyResponse for the arguments and the returned
+    dict) of the gain of the closed form (see compile), the derivative of out_symb with respect to in_symb,
+    where capacitors maps the symbols of impedances (e.g. R_nfb) that are capacitors to their capacitance.
+    Example (a non-inverting amp with a 10nF capacitor as R_v_m: a gain of 1 at dc rising 20dB/decade):
+      config.frequencyResponse(np.logspace(1, 5, 400), {R_v_m: '10n'}, {R_nfb: '10k'})'''
+    out_symb = self._out_symb if out_symb is None else out_symb
+    in_symb = self._in_symb if in_symb is None else in_symb
+    substituted = [ symb for symb in capacitors if symb in self._subs ]
+    if substituted: raise ValueError(f'{substituted} are in subs so they cannot be capacitors (unsub them first)')
+    return frequencyResponse(self._closedForm(out_symb, in_symb)['gain'], freqs, capacitors, subs)
+
+  def _closedForm(self, out_symb, in_symb):
+    key = (out_symb, in_symb)
+    closed = self._closed_forms.get(key)
+    if closed is None or closed['subs'] != self._subs: # (the check catches self.subs being modified in place)
+      sol = cachedSolve(self._eq.subs(self._subs), out_symb)
+      if len(sol) != 1: raise ValueError(f'{out_symb} does not have a single closed form ({len(sol)} solutions)')
+      expr = sol[0]
+      gain = simplify(expr.diff(in_symb))
+      closed = { 'subs': self._subs.copy(), 'expr': expr, 'gain': gain, 'offset': expr.subs(in_symb, 0),
+                 'denominators': tuple(sp.denom(sp.together(form)) for form in (expr, gain)) }
+      self._closed_forms[key] = closed
+    return closed
+
+  def _canUseClosedForm(self, subs):
+    '''the closed form has self.subs already substituted, so it can't be used when subs overrides any of them.
+    It can't be used either when subs gives out_symb a value, or zeroes a denominator of the closed form
+    (where solving the substituted equation has no solution, e.g. a divider with R_v_m of 0). A value for
+    in_symb (as solveForCoords passes) is just substituted into the closed form:
+      >>> config = OpampConfig(v_pIn, vDivExpr(v_out, R_nfb, R_v_m, 0))
+      >>> config.solve(subs={R_nfb: 0, R_v_m: 0})
+      []
+      >>> config.solve(v_out, subs={R_v_m: 0})
+      []
+    '''
+    if any(symb in self._subs for symb in subs): return False
+    if self._out_symb in subs: return False
+    try: closed = self._closedForm(self._out_symb, self._in_symb)
+    except ValueError: return False
+    return not any(denominator.subs(subs).is_zero for denominator in closed['denominators'])
   
   @property
   def eq(self): return self._eq
@@ -259,6 +376,7 @@ class OpampConfig:
     ''':param v_p: an expression, symbol or value representing the voltage at the non-inverting input pin.'''
     self._v_p = v_p 
     self._eq = Eq(self._v_p, self._v_m) 
+    self._closed_forms.clear()
   
   @property
   def v_m(self): return self._v_m
@@ -269,6 +387,7 @@ class OpampConfig:
     :param subs: a dictionary of symbol, value pairs always substituted into either/both of the previous.'''
     self._v_m = v_m 
     self._eq = Eq(self._v_p, self._v_m) 
+    self._closed_forms.clear()
     
   @property
   def subs(self): return self._subs
@@ -277,20 +396,23 @@ class OpampConfig:
   def subs(self, subs):
     ''':param subs: a dictionary of symbol, value pairs always substituted into v_p and/or v_m'''
     self._subs = subs.copy()
+    self._closed_forms.clear()
 
   def subsAdd(self, subs):
     ''':param subs: a dictionary of symbol, value pairs always substituted into v_p and/or v_m'''
     self._subs |= subs
+    self._closed_forms.clear()
 
   def unsub(self, *symbols):
     ''':param symbols: any number of symbols to be removed from subs and no longer substituted'''
     for symb in symbols: self._subs.pop(symb, None)
+    self._closed_forms.clear()
   
   @property
   def in_symb(self): return self._in_symb
 
   @in_symb.setter
-  def v_p(self, in_symb):
+  def in_symb(self, in_symb):
     ''':param in_symb: the symbol or value representing the input voltage to the opamp or opamp config'''
     self._in_symb = in_symb 
 
@@ -302,3 +424,9 @@ class OpampConfig:
   def out_symb(self, out_symb):
     ''':param out_symb: the symbol or value representing the input voltage from the opamp'''
     self._out_symb = out_symb 
+
+
+def _opampConfigFromSrepr(args_srepr):
+  # unpickles an OpampConfig (see OpampConfig.__reduce__), rebuilding its arguments under evaluate(False)
+  with sp.evaluate(False): args = eval(args_srepr, vars(sp))
+  return OpampConfig(*args)
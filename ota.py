@@ -3,9 +3,10 @@ from sympy import Eq
 from eeMath.math_helpers import lambdifier
 
 from eeMath.eeSymbols import V_T, g_m, v_in, v_p, v_m, i_abc, i_out, v_out, R_out, t_Kelvin, t_Celsius, t_Fahr, R_fb, R_A, R_X
-from eeMath.eeSymbols import i_Ep, i_Em, i_Bp, i_Bm, i_Cp, i_Cm
+from eeMath.eeSymbols import i_Ep, i_Em, i_Bp, i_Bm, i_Cp, i_Cm, v_diff, getSymb
 from eeMath.bjt import *
-from eeMath.thermal import VT_approx, kelvin_of_celsius_expr, kelvin_of_fahr_expr, VTofTemp, tempOfVT
+from eeMath.thermal import VT_approx, kelvin_of_celsius_expr, kelvin_of_fahr_expr, VTofTemp, tempOfVT, tempConvert
+from eeMath.eq_cache import cachedEqs
 # About the above:
 # - v_p and v_m are the V+ and V- OTA inputs, we'll use v_in as V+ when v_m is grounded (0)
 # - V_T is "thermal voltage" a property of BJT's (in OTA), which  changes with temperature so 
@@ -20,9 +21,6 @@ with sp.evaluate(False):
   ideal_ota_i_out = (i_abc / (2 * V_T)) * (v_p - v_m)
   ideal_ota_v_out = R_out * ideal_ota_i_out
   ideal_ota_i_out_eq = Eq( i_out, ideal_ota_i_out)
-  ideal_ota_kelvin_i_out_eq  = Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Kelvin, 'K') }) )
-  ideal_ota_celsius_i_out_eq = Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Celsius, 'C')}) )
-  ideal_ota_fahr_i_out_eq    = Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Fahr, 'F')}) )
 
   sauer_ota_i_out    = -1 * i_abc * sp.tanh((v_p - v_m)/.052)
   sauer_ota_i_out_eq = Eq( i_out, sauer_ota_i_out )
@@ -31,9 +29,25 @@ with sp.evaluate(False):
   # real_ota_vcr_R_X_eq = Eq( R_X, (2*R_fb)/(ota_gm*R_A)) # R_A connects v_m's, assumes R_pulldown's are 10k to -15v
   real_ota_v_out = R_out * ideal_ota_i_out
   real_ota_i_out_eq = Eq( i_out, real_ota_i_out)
-  real_ota_kelvin_i_out  = Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Kelvin, 'K') }) )
-  real_ota_celsius_i_out = Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Celsius, 'C')}) )
-  real_ota_fahr_i_out    = Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Fahr, 'F')}) )
+
+def _temperatureEqs(): # built once, then loaded from the equation cache (see eq_cache.py)
+  with sp.evaluate(False): 
+    return {
+      'ideal_ota_kelvin_i_out_eq':  Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Kelvin, 'K') }) ),
+      'ideal_ota_celsius_i_out_eq': Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Celsius, 'C')}) ),
+      'ideal_ota_fahr_i_out_eq':    Eq( i_out, ideal_ota_i_out.subs({V_T: VTofTemp(t_Fahr, 'F')}) ),
+      'real_ota_kelvin_i_out':  Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Kelvin, 'K') }) ),
+      'real_ota_celsius_i_out': Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Celsius, 'C')}) ),
+      'real_ota_fahr_i_out':    Eq( i_out, real_ota_i_out.subs({V_T: VTofTemp(t_Fahr, 'F')}) ),
+    }
+
+_temperature_eqs = cachedEqs('ota', _temperatureEqs)
+ideal_ota_kelvin_i_out_eq  = _temperature_eqs['ideal_ota_kelvin_i_out_eq']
+ideal_ota_celsius_i_out_eq = _temperature_eqs['ideal_ota_celsius_i_out_eq']
+ideal_ota_fahr_i_out_eq    = _temperature_eqs['ideal_ota_fahr_i_out_eq']
+real_ota_kelvin_i_out  = _temperature_eqs['real_ota_kelvin_i_out']
+real_ota_celsius_i_out = _temperature_eqs['real_ota_celsius_i_out']
+real_ota_fahr_i_out    = _temperature_eqs['real_ota_fahr_i_out']
 
 
 discrete_ota_eq = {}
@@ -47,6 +61,93 @@ with sp.evaluate(False):
   discrete_ota_eq[i_Cp] = Eq( i_Cp, i_Ep - i_Bp )
 
 
+#### NUMERIC SWEEPS ###############################################################################
+
+def discreteOtaExpr(solve_for=i_out):
+  '''returns the rhs of discrete_ota_eq[solve_for] with the other discrete_ota_eq equations substituted
+  in until it only depends on v_p, v_m, i_abc, V_T and beta. For the default, i_out, this is:
+    i_abc * beta/(beta + 1) * tanh((v_p - v_m)/(2*V_T))  (although not in that form)'''
+  expr = discrete_ota_eq[solve_for].rhs
+  while expr.free_symbols & discrete_ota_eq.keys():
+    expr = expr.subs({ symb: discrete_ota_eq[symb].rhs for symb in expr.free_symbols & discrete_ota_eq.keys() })
+  return expr
+
+# the i_out expressions that otaSweep can evaluate by name
+ota_models = {
+  'ideal': ideal_ota_i_out,
+  'real': real_ota_i_out,
+  'sauer': sauer_ota_i_out,
+  'discrete': discreteOtaExpr(i_out),
+}
+
+def _otaModelFunc(model, param_symbs):
+  expr = ota_models[model] if isinstance(model, str) else model
+  if expr.is_Equality: expr = expr.rhs
+  expr = expr.subs({v_p: v_diff, v_m: 0}) # all of the models only depend on v_p - v_m
+  unknown = expr.free_symbols - {v_diff, i_abc, V_T, *param_symbs}
+  if unknown: raise ValueError(f'otaSweep needs values for these symbols of the model (pass as kwargs): {unknown}')
+  return lambdifier(expr, v_diff, i_abc, V_T, *param_symbs, backend='numpy')
+
+def otaSweep(model='real', v_diff=0, i_abc=1e-3, temp=None, temp_unit='C', V_T=None, grid=True, **params):
+  '''otaSweep(model='real', v_diff=0, i_abc=1e-3, temp=None, temp_unit='C', V_T=None, grid=True, **params)
+  numerically evaluates an OTA's i_out over arrays of operating points. The model is compiled (lambdified
+  for numpy) once per model, so each call is a single vectorized numpy evaluation.
+    model     'ideal', 'real' (tanh), 'sauer' or 'discrete' (see ota_models) or any sympy expression or Eq 
+              (rhs is used) of v_p, v_m (or v_diff), i_abc and V_T (plus any symbols given in params)
+    v_diff    v_p - v_m in volts: a number or array
+    i_abc     the control current in amps: a number or array
+    temp      temperature(s) in temp_unit ('C', 'F' or 'K'), converted to V_T with VTofTemp.
+    V_T       the thermal voltage(s) (used instead of temp). If neither is given, VT_approx is used.
+    params    values for any other symbol in the model by the name it was declared with, i.e. beta=100 
+              (which 'discrete' requires)
+    grid      if True (default) each of v_diff, i_abc and temp (or V_T) given as a 1-D array becomes 
+              a dimension of the returned array, in that order (scalars don't add a dimension) so 
+              otaSweep('real', v_diff=linspace(-.1,.1,201), i_abc=[1e-4, 1e-3]) returns a 201x2 array.
+              If False, the arrays (of any number of dimensions) are broadcast against each other as is.
+  Returns a dict: 
+    { 'i_out': ndarray, 'dims': ('v_diff', 'i_abc', ...) (the name of each dimension when grid=True),
+      'v_diff': v_diff, 'i_abc': i_abc, 'temp' or 'V_T': temp or V_T (the values as passed, as arrays) }
+  '''
+  import numpy as np
+
+  param_symbs = []
+  for name in params:
+    symb = getSymb(name)
+    if symb is None: raise ValueError(f'otaSweep got a value for {name}, which is not a declared symbol')
+    param_symbs.append(symb)
+  func = _otaModelFunc(model, tuple(param_symbs))
+
+  if V_T is not None: temp_label, temp_vals = 'V_T', np.asarray(V_T, dtype=float)
+  elif temp is not None: temp_label, temp_vals = 'temp', np.asarray(temp, dtype=float)
+  else: temp_label, temp_vals = 'V_T', np.asarray(float(VT_approx))
+  
+  labelled = { 'v_diff': np.asarray(v_diff, dtype=float), 'i_abc': np.asarray(i_abc, dtype=float), temp_label: temp_vals }
+  if grid:
+    dims = tuple(label for label, vals in labelled.items() if vals.ndim)
+    for label, vals in labelled.items():
+      if vals.ndim > 1: raise ValueError(f'otaSweep with grid=True needs {label} to be a number or 1-D (pass grid=False)')
+    inputs = {}
+    for label, vals in labelled.items():
+      if vals.ndim: # put this axis in its own dimension so numpy broadcasts the outer product
+        shape = [1] * len(dims)
+        shape[dims.index(label)] = len(vals)
+        inputs[label] = vals.reshape(shape)
+      else: inputs[label] = vals
+  else:
+    dims = ()
+    inputs = dict(labelled)
+
+  if temp_label == 'temp': inputs['V_T'] = VTofTemp(tempConvert(inputs.pop('temp'), temp_unit, 'K'), 'K')
+  
+  with np.errstate(over='ignore'): # exp overflows to inf for large v_diff/V_T, which gives the correct limit
+    out = func(inputs['v_diff'], inputs['i_abc'], inputs['V_T'], *params.values())
+  shape = np.broadcast_shapes(*(np.shape(x) for x in (inputs['v_diff'], inputs['i_abc'], inputs['V_T'], *params.values())))
+  out = np.asarray(out, dtype=float)
+  if out.shape != shape: out = np.broadcast_to(out, shape).copy()
+
+  return { 'i_out': out, 'dims': dims, **labelled }
+
+
 
 
 # if we didn't care to ever change V_T, we'd replace the above with:
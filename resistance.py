@@ -1,4 +1,7 @@
 import sympy as sp
+from eeMath.discrete import bitmaskList
+from eeMath.general_helpers import func_attr
+from eeMath.units import parseNum
 
 def parallelR(*R_tuple):
   '''pass a bunch of resistance and get the resistance of them all in parallel'''
@@ -32,7 +35,7 @@ def get_Rll_eq(Rll_sym_or_val, *R_tuple):
 #     product *= number
 #   return product
 
-def parallelRPermutations(resistor_values, always_parallel_R=None, lsb_last=False, inv=False):
+def parallelRPermutations(resistor_values, always_parallel_R=None, lsb_last=False, inv=False, numeric=False):
   '''Output is list of all permutations of parallel resistances from any
   (or all) of the resistor_values list. The output list size is: 
     2**len(resistor_values) - 1  elements
@@ -44,7 +47,13 @@ def parallelRPermutations(resistor_values, always_parallel_R=None, lsb_last=Fals
     in parallel, if False, it only one resistor. 
   inv (default=False) (4th arg) Set this to True if resistor outputs
     are active-LOW (enbled by LOW rather than HIGH)
+  numeric (default=False) If True, resistor_values (and always_parallel_R) must be numbers and
+    the return is a numpy float64 array (same order as the list) computed without sympy: the 
+    conductance sum of every subset is built by doubling the table of sums once per resistor, so 
+    each state costs one addition. Use this for more than a handful of resistors. For so many
+    resistors that the array itself is too large, see parallelRPermutationsIter.
   '''
+  if numeric: return _parallelRPermutationsArray(resistor_values, always_parallel_R, lsb_last, inv)
   results = []
   for bint in range(1, 2**len(resistor_values)):
     active_parallel_resitors = bitmaskList(bint, resistor_values, lsb_last, inv)
@@ -56,6 +65,123 @@ def parallelRPermutations(resistor_values, always_parallel_R=None, lsb_last=Fals
     # results.append(active_parallel_resitors)
   return results
 
+def _conductances(resistor_values, lsb_last):
+  # conductance of the resistor switched by each bit of the bitmask int, LSB first (as bitmaskList)
+  conductances = [ 1 / float(R_val) for R_val in resistor_values ]
+  if lsb_last: conductances.reverse()
+  return conductances
+
+def _parallelRPermutationsArray(resistor_values, always_parallel_R=None, lsb_last=False, inv=False):
+  import numpy as np
+  conductances = _conductances(resistor_values, lsb_last)
+  G_sums = np.zeros(1) # G_sums[bint] is the conductance sum of the resistors ON in bint
+  for G in conductances: G_sums = np.concatenate((G_sums, G_sums + G))
+  # bint runs from 1 to 2**n - 1 (as in the list version) minus the state with no resistors ON.
+  # With inv, the resistors ON are the OFF bits of bint, whose sum is at index (2**n - 1) - bint
+  G_sums = G_sums[-2:0:-1] if inv else G_sums[1:]
+  if always_parallel_R: G_sums += 1 / float(always_parallel_R)
+  with np.errstate(divide='ignore'): return 1 / G_sums
+
+def parallelRPermutationsIter(resistor_values, always_parallel_R=None, lsb_last=False, inv=False):
+  '''Generator version of parallelRPermutations(..., numeric=True) for when 2**len(resistor_values) 
+  floats is too many to hold in memory. The states are walked in Gray code order so each step 
+  switches a single resistor and updates the parallel conductance with one addition or subtraction.
+  Because that isn't the order parallelRPermutations returns, each yield is a 2-tuple: 
+    (bint, resistance) 
+  where bint is the bitmask int for the state, so bitmaskList(bint, resistor_values, lsb_last, inv)
+  gives the resistors that are in parallel for that resistance.'''
+  conductances = _conductances(resistor_values, lsb_last)
+  all_on = 2**len(conductances) - 1
+  G_always = 1 / float(always_parallel_R) if always_parallel_R else 0.0
+  G_sum = G_always + (sum(conductances) if inv else 0.0) # with inv, bint=0 has all resistors ON
+  gray = 0
+  for k in range(1, all_on + 1):
+    bit = (k & -k).bit_length() - 1  # the bit that changes between consecutive Gray codes
+    gray ^= 1 << bit
+    if bool(gray >> bit & 1) != inv: G_sum += conductances[bit] # resistor switched ON
+    else: G_sum -= conductances[bit]                             # resistor switched OFF
+    if inv and gray == all_on: continue # no resistors are ON
+    yield gray, (1 / G_sum if G_sum else float('inf'))
+
+
+#### STANDARD (E-SERIES) VALUES ###################################################################
 
 # Resistor Values
-# https://eepower.com/resistor-guide/resistor-standards-and-codes/resistor-values/#
\ No newline at end of file
+# https://eepower.com/resistor-guide/resistor-standards-and-codes/resistor-values/#
+# (the same IEC 60063 E-series are used for capacitors and inductors)
+
+# one decade of each series as integer mantissas in hundredths (so 470 is 4.70, 4.7, 47, 470, 4.7k...)
+# E3 to E24 are historical roundings of 10**(i/n) so they are listed. E48 to E192 are 10**(i/n) rounded
+# to 3 significant figures except for the one exception in E192 (9.20 rather than 9.19).
+e_series = {
+  'E3':  (100, 220, 470),
+  'E6':  (100, 150, 220, 330, 470, 680),
+  'E12': (100, 120, 150, 180, 220, 270, 330, 390, 470, 560, 680, 820),
+  'E24': (100, 110, 120, 130, 150, 160, 180, 200, 220, 240, 270, 300, 
+          330, 360, 390, 430, 470, 510, 560, 620, 680, 750, 820, 910),
+  'E48':  tuple(round(100 * 10**(i/48)) for i in range(48)),
+  'E96':  tuple(round(100 * 10**(i/96)) for i in range(96)),
+  'E192': tuple(920 if i == 185 else round(100 * 10**(i/192)) for i in range(192)),
+}
+
+e_series_decades = range(-12, 10) # eSeriesIndex spans 1.00p (capacitors) to 9.xxG (resistors)
+
+@func_attr(cache={})
+def eSeriesIndex(series='E24'):
+  '''returns a sorted numpy float64 array of every value of series (i.e. 'E12' or 12) in all decades of
+  e_series_decades. The array is built once per series and is read-only. Values are exact to the
+  decimal (i.e. 4.7e-9 rather than 4.7 * 1e-9).'''
+  import numpy as np
+  series = f'E{series}' if isinstance(series, int) else series.upper()
+  if series not in eSeriesIndex.cache:
+    if series not in e_series: raise ValueError(f'unknown E-series {series}. Use one of {list(e_series)}')
+    index = np.array([ float(f'{mantissa}e{decade-2}') for decade in e_series_decades for mantissa in e_series[series] ])
+    index.flags.writeable = False
+    eSeriesIndex.cache[series] = index
+  return eSeriesIndex.cache[series]
+
+def _eValuesArray(values):
+  import numpy as np
+  if isinstance(values, str): return np.asarray(parseNum(values), dtype=float)
+  array = np.asarray(values)
+  if array.dtype.kind in 'OUS': # strings (or a mix of strings and numbers) such as '4.7k'
+    if not isinstance(values, np.ndarray): array = np.asarray(values, dtype=object) # keep numbers as numbers
+    return np.vectorize(lambda v: float(parseNum(v)), otypes=[float])(array)
+  return array.astype(float)
+
+def bracketEValue(values, series='E24'):
+  '''bracketEValue(values, series='E24')
+  returns (lower, upper): the largest standard value <= each of values and the smallest >= it (both
+  are the same value where a value is already standard). values can be a number, a string that
+  parseNum understands ('4.7k'), or a list/array of either. Returns floats for a single value
+  or arrays of the same shape as values. Values outside of eSeriesIndex(series) are clipped to it, but
+  values that aren't finite and positive (nan, inf, 0 or negative) raise a ValueError.'''
+  import numpy as np
+  index = eSeriesIndex(series)
+  vals = _eValuesArray(values)
+  bad = ~(np.isfinite(vals) & (vals > 0))
+  if bad.any(): raise ValueError(f'E-series values must be finite and positive (got {vals[bad].tolist()})')
+  upper_i = np.clip(np.searchsorted(index, vals, side='left'), 0, len(index) - 1)
+  lower_i = np.clip(np.searchsorted(index, vals, side='right') - 1, 0, len(index) - 1)
+  lower, upper = index[lower_i], index[upper_i]
+  if vals.ndim == 0: return float(lower), float(upper)
+  return lower, upper
+
+def nearestEValue(values, series='E24'):
+  '''nearestEValue(values, series='E24')
+  snaps each of values to the nearest value in the series, where nearest is by ratio rather than by 
+  difference since the series are geometric (4.9k snaps to 5.1k because 5.1/4.9 < 4.9/4.7). values can be 
+  a number, a string that parseNum understands ('4.7k'), or a list/array of either. Returns a float
+  for a single value or an array of the same shape as values. Values that aren't finite and positive
+  raise a ValueError (see bracketEValue).
+  Examples:
+    nearestEValue(4800)                          # 4700.0
+    nearestEValue(['4.8k', 1.23e-9], 'E96')      # array([4.75e+03, 1.24e-09])'''
+  import numpy as np
+  lower, upper = bracketEValue(values, series)
+  vals = _eValuesArray(values)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    nearest = np.where(vals * vals > lower * upper, upper, lower) # compares vals/lower with upper/vals
+  return float(nearest) if nearest.ndim == 0 else nearest
+
+
@@ -0,0 +1,11 @@
+# The modules import each other as eeMath.<module>, so make this checkout importable as the eeMath
+# package whatever its directory is called (unless an eeMath is already importable).
+import sys
+from importlib.util import find_spec, module_from_spec, spec_from_file_location
+from pathlib import Path
+
+if find_spec('eeMath') is None:
+  _root = Path(__file__).resolve().parent.parent
+  _spec = spec_from_file_location('eeMath', _root / '__init__.py', submodule_search_locations=[str(_root)])
+  sys.modules['eeMath'] = module_from_spec(_spec)
+  _spec.loader.exec_module(sys.modules['eeMath'])
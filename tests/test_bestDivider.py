@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from eeMath.eeFundamentals import bestDivider
+from eeMath.resistance import eSeriesIndex
+
+
+def _bruteErrors(ratio, series, r_total_range, top_k):
+  # |error| of the top_k pairs found by trying every pair
+  index = eSeriesIndex(series)
+  R_GND, R_IN = (grid.ravel() for grid in np.meshgrid(index, index, indexing='ij'))
+  total = R_GND + R_IN
+  in_range = (total >= r_total_range[0]) & (total <= r_total_range[1])
+  error = np.abs(R_GND[in_range] / total[in_range] - ratio) / ratio
+  return sorted(error)[:top_k]
+
+
+def test_narrow_total_range():
+  best = bestDivider(0.8842, 'E96', (2605.6, 2606.9), 1)
+  assert len(best) == 1
+  assert 2605.6 <= best[0]['R_IN'] + best[0]['R_GND'] <= 2606.9
+  assert abs(best[0]['error']) == pytest.approx(_bruteErrors(0.8842, 'E96', (2605.6, 2606.9), 1)[0])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_brute_force(seed):
+  rng = np.random.default_rng(seed)
+  ratio, r_min = rng.uniform(0.01, 0.99), 10**rng.uniform(2, 6)
+  r_total_range, top_k = (r_min, r_min * (1 + 10**rng.uniform(-4, 1))), int(rng.integers(1, 8))
+  errors = [ abs(pair['error']) for pair in bestDivider(ratio, 'E24', r_total_range, top_k) ]
+  assert errors == pytest.approx(_bruteErrors(ratio, 'E24', r_total_range, top_k))
@@ -0,0 +1,29 @@
+import sympy as sp
+
+from eeMath.eq_cache import cachedEqs, buildEqCache, _readEqs
+
+
+def _sameTree(a, b):
+  return type(a) == type(b) and a.args == b.args and all(_sameTree(x, y) for x, y in zip(a.args, b.args))
+
+
+def test_loaded_equals_built(tmp_path, monkeypatch):
+  monkeypatch.setenv('EEMATH_EQ_CACHE', str(tmp_path))
+  buildEqCache() # registers every family's builder and writes its file to tmp_path
+  assert cachedEqs.builders
+  for family, build in cachedEqs.builders.items():
+    built, loaded = build(), _readEqs(family)
+    assert loaded is not None, family
+    assert loaded.keys() == built.keys()
+    for name, eq in built.items():
+      assert loaded[name] == eq, name
+      assert hash(loaded[name]) == hash(eq), name
+      assert _sameTree(loaded[name], eq), name
+
+
+def test_ohmslaw_eq_is_canonical():
+  # (loaded from the cache file when it's warm, built when it's cold: the same either way)
+  from eeMath.eeFundamentals import ohmslaw_I_eq
+  from eeMath.eeSymbols import I, V, R
+  assert ohmslaw_I_eq == sp.Eq(I, V / R)
+  assert ohmslaw_I_eq.rhs.args == (V / R).args
@@ -0,0 +1,13 @@
+import eeMath
+
+
+def test_units_star_import_is_its_export_table():
+  namespace = {}
+  exec('from eeMath.units import *', namespace)
+  namespace.pop('__builtins__')
+  assert set(namespace) == set(eeMath._exports['units'])
+
+
+def test_helper_imports_not_exported():
+  # eager mode (the default) must not expose helper imports that lazy mode's export table doesn't have
+  for name in ('log10', 're_compile', 'environ'): assert not hasattr(eeMath, name), name
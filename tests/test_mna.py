@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from eeMath.mna import MnaCircuit, _luFactor, _luSolve
+
+
+@pytest.mark.parametrize('n', [1, 4, 40])
+def test_lu_matches_numpy(n):
+  rng = np.random.default_rng(n)
+  A, b = rng.normal(size=(n, n)), rng.normal(size=(n, 3))
+  lu, perm = _luFactor(A)
+  assert np.allclose(_luSolve(lu, perm, b), np.linalg.solve(A, b))
+  assert np.allclose(_luSolve(lu, perm, b[:, 0]), np.linalg.solve(A, b[:, 0]))
+
+
+def test_singular():
+  with pytest.raises(ValueError): _luFactor(np.array([[1., -1.], [-1., 1.]]))
+  with pytest.raises(ValueError): MnaCircuit(['V1 in 0 10', 'R1 a b 1k']).solve()
+
+
+def test_factorization_reused_for_sources():
+  circuit = MnaCircuit(['V1 in 0 10', 'R1 in out 10k', 'R2 out 0 10k'])
+  assert circuit.solve() == pytest.approx({'in': 10.0, 'out': 5.0, 'I(V1)': -0.0005})
+  factored = circuit._factored
+  assert circuit.solve({'V1': np.arange(3.)})['out'] == pytest.approx([0, 0.5, 1])
+  assert circuit._factored is factored
+  assert circuit.solve({'R2': '30k'})['out'] == pytest.approx(7.5)
+  assert circuit._factored is not factored
@@ -0,0 +1,47 @@
+import sympy as sp
+import pytest
+
+from eeMath.opamp import OpampConfig
+from eeMath.eeFundamentals import vDivExpr
+from eeMath.eeSymbols import v_pIn, v_out, R_nfb, R_v_m
+from eeMath.math_helpers import cachedSolve
+
+
+@pytest.fixture
+def solveCalls(monkeypatch):
+  # the symbols of every sp.solve call (with the solve cache off, so every solve reaches sp.solve)
+  calls = []
+  solve = sp.solve
+  def spy(eqs, symbols, **flags):
+    calls.append(symbols)
+    return solve(eqs, symbols, **flags)
+  monkeypatch.setattr(cachedSolve, 'enabled', False)
+  monkeypatch.setattr(sp, 'solve', spy)
+  return calls
+
+
+def _noninv():
+  config = OpampConfig(v_pIn, vDivExpr(v_out, R_nfb, R_v_m, 0))
+  config.compile() # solves for the closed form
+  return config
+
+
+def test_solve_with_in_symb_uses_closed_form(solveCalls):
+  config = _noninv()
+  solveCalls.clear()
+  assert config.solve(v_out, subs={v_pIn: 2, R_v_m: 1000}) == 2 * (R_nfb + 1000) / 1000
+  assert solveCalls == []
+
+
+def test_solveForCoords_uses_closed_form(solveCalls):
+  config = _noninv()
+  solveCalls.clear()
+  sol = config.solveForCoords((1, 2), (2, 4), subs={R_v_m: 1000})
+  assert sol == {R_nfb: 1000}
+  assert len(solveCalls) == 1 and v_out not in solveCalls[0] # (only the system of the two coords)
+
+
+def test_degenerate_subs_fall_back():
+  config = OpampConfig(v_pIn, vDivExpr(v_out, R_nfb, R_v_m, 0))
+  assert config.solve(subs={R_nfb: 0, R_v_m: 0}) == []
+  assert config.solve(v_out, subs={R_v_m: 0}) == []
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from eeMath.resistance import bracketEValue, nearestEValue
+
+
+def test_nearest():
+  assert nearestEValue(4800) == 4700.0
+  assert nearestEValue(4900) == 5100.0
+  assert nearestEValue(['4.8k', 1.23e-9], 'E96') == pytest.approx([4.75e3, 1.24e-9])
+  assert bracketEValue('4.8k') == (4700.0, 5100.0)
+
+
+@pytest.mark.parametrize('bad', [np.nan, np.inf, -np.inf, 0, -4700, [4700, np.nan], np.array([[1e3], [0]]), '-4.7k'])
+@pytest.mark.parametrize('func', [nearestEValue, bracketEValue])
+def test_rejects_non_positive_or_non_finite(func, bad):
+  with pytest.raises(ValueError, match='finite and positive'): func(bad)
@@ -0,0 +1,27 @@
+import sympy as sp
+import pytest
+
+from eeMath.math_helpers import cachedSolve, solveCacheInfo
+from eeMath.eeFundamentals import ohmslaw_V_eq, vdiv_out_eq
+from eeMath.eeSymbols import I, R_IN, R_GND
+
+
+def _sameTree(a, b):
+  if isinstance(a, (list, tuple)): return type(a) == type(b) and len(a) == len(b) and all(map(_sameTree, a, b))
+  if isinstance(a, dict): return a.keys() == b.keys() and all(_sameTree(a[k], b[k]) for k in a)
+  return type(a) == type(b) and a == b and hash(a) == hash(b) and a.args == b.args and \
+    all(_sameTree(x, y) for x, y in zip(a.args, b.args))
+
+
+@pytest.mark.parametrize('eqs, symbols', [ (ohmslaw_V_eq, I), (vdiv_out_eq, R_IN), ([vdiv_out_eq], [R_IN, R_GND]) ])
+def test_memory_disk_and_fresh_are_equal(tmp_path, monkeypatch, eqs, symbols):
+  monkeypatch.setattr(cachedSolve, 'disk_dir', str(tmp_path))
+  solveCacheInfo(clear=True)
+  fresh = sp.solve(eqs, symbols)
+  first = cachedSolve(eqs, symbols)  # a miss: solved and written to disk
+  memory = cachedSolve(eqs, symbols)
+  solveCacheInfo(clear=True)         # (keeps the disk tier)
+  disk = cachedSolve(eqs, symbols)
+  assert solveCacheInfo()['disk_hits'] == 1
+  for sol in (first, memory, disk): assert _sameTree(sol, fresh)
+  solveCacheInfo(clear=True)
@@ -0,0 +1,196 @@
+import sympy as sp
+
+from eeMath.general_helpers import func_attr
+from eeMath.units import parseNum
+
+###### MONTE-CARLO TOLERANCE ANALYSIS #############################################################
+
+# monteCarlo propagates component tolerances through an equation (or expression) by compiling its rhs
+# once with numpy and evaluating it on random samples of its symbols in chunks. Only the summary of each
+# chunk (count, mean, sum of squared deviations, min, max, a fine histogram and the count within limits)
+# is kept and merged, so memory use depends on chunk_size rather than n. Each chunk gets its own random
+# generator spawned from seed, so the result for a given seed doesn't depend on processes or chunk order.
+
+# distributions of the form {symbol: (kind, *params)}, where tol can be a ratio (0.01) or a string ('1%'):
+#   ('uniform', tol)              nominal * (1 + uniform(-tol, tol))
+#   ('normal', tol[, sigmas=3])   nominal * (1 + normal(0, tol/sigmas)) i.e. tol is the (3) sigma tolerance
+#   ('range', low, high)          uniform(low, high)
+#   ('gauss', mean, std)          normal(mean, std)
+# or a function taking (rng, size) and returning size samples (with processes, it must be picklable,
+# i.e. defined at module level). nominal is the symbol's value in the nominals argument.
+mc_distribution_kinds = ('uniform', 'normal', 'range', 'gauss')
+
+_fine_bins_per_bin = 64 # the quantiles come from a histogram this many times finer than the returned one
+
+
+def _tolerance(tol):
+  if isinstance(tol, str) and tol.strip().endswith('%'): return parseNum(tol.strip()[:-1]) / 100
+  return parseNum(tol)
+
+def _normalizedDistribution(symb, spec, nominals):
+  # returns a picklable (kind, a, b) where the samples are made by _sample
+  if callable(spec): return ('func', spec, None)
+  kind, *params = spec
+  if kind in ('uniform', 'normal'):
+    if symb not in nominals: raise ValueError(f'{kind} distribution of {symb} needs a value for it in nominals')
+    nominal, tol = parseNum(nominals[symb]), _tolerance(params[0])
+    if kind == 'uniform': return ('range', nominal * (1 - tol), nominal * (1 + tol))
+    sigmas = params[1] if len(params) > 1 else 3
+    return ('gauss', nominal, nominal * tol / sigmas)
+  if kind in ('range', 'gauss'): return (kind, parseNum(params[0]), parseNum(params[1]))
+  raise ValueError(f'unknown distribution kind {kind!r} for {symb}. Use one of {mc_distribution_kinds} or a function')
+
+def _nominal(symb, distribution, nominals):
+  kind, a, b = distribution
+  if symb in nominals: return parseNum(nominals[symb])
+  if kind == 'range': return (a + b) / 2
+  if kind == 'gauss': return a
+  return float('nan')
+
+def _sample(distribution, rng, size):
+  kind, a, b = distribution
+  if kind == 'range': return rng.uniform(a, b, size)
+  if kind == 'gauss': return rng.normal(a, b, size)
+  return a(rng, size)
+
+
+@func_attr(funcs={})
+def _compiled(expr_srepr, args_srepr):
+  # the numpy function of the expression, compiled once per process (the expression is passed as srepr
+  # so it crosses process boundaries without being re-evaluated by unpickling, as in eq_cache.py)
+  key = (expr_srepr, args_srepr)
+  if key not in _compiled.funcs:
+    namespace = vars(sp)
+    with sp.evaluate(False): expr, args = eval(expr_srepr, namespace), eval(args_srepr, namespace)
+    _compiled.funcs[key] = sp.lambdify(args, expr, modules='numpy')
+  return _compiled.funcs[key]
+
+def _chunkStats(expr_srepr, args_srepr, distributions, fixed, size, seed_seq, fine_range, n_fine, limits):
+  import numpy as np
+  rng = np.random.default_rng(seed_seq)
+  func = _compiled(expr_srepr, args_srepr)
+  vals = [ _sample(distribution, rng, size) for distribution in distributions ]
+  y = np.broadcast_to(np.asarray(func(*vals, *fixed), dtype=float), (size,))
+  finite = np.isfinite(y)
+  n_invalid = size - int(finite.sum())
+  if n_invalid: y = y[finite]
+  stats = { 'n': len(y), 'n_invalid': n_invalid, 'mean': 0.0, 'M2': 0.0, 'min': np.inf, 'max': -np.inf,
+            'in_limits': 0, 'fine': np.zeros(n_fine, dtype=np.int64), 'under': 0, 'over': 0 }
+  if not len(y): return stats
+  mean = y.mean()
+  stats.update(mean=float(mean), M2=float(((y - mean)**2).sum()), min=float(y.min()), max=float(y.max()))
+  if limits is not None:
+    low, high = limits
+    stats['in_limits'] = int(np.count_nonzero((y >= low) & (y <= high)))
+  low, high = fine_range
+  idx = np.floor((y - low) * (n_fine / (high - low))).astype(np.int64)
+  idx[y == high] = n_fine - 1 # the last bin includes its upper edge (as numpy.histogram)
+  stats['under'] = int(np.count_nonzero(idx < 0))
+  stats['over'] = int(np.count_nonzero(idx >= n_fine))
+  stats['fine'] = np.bincount(idx[(idx >= 0) & (idx < n_fine)], minlength=n_fine)
+  return stats
+
+def _mergeStats(total, stats):
+  # Chan et al's parallel update of the mean and the sum of squared deviations (M2)
+  n_a, n_b = total['n'], stats['n']
+  if n_b:
+    n = n_a + n_b
+    delta = stats['mean'] - total['mean']
+    total['mean'] += delta * n_b / n
+    total['M2'] += stats['M2'] + delta**2 * n_a * n_b / n
+    total['n'] = n
+    total['min'], total['max'] = min(total['min'], stats['min']), max(total['max'], stats['max'])
+  for key in ('n_invalid', 'in_limits', 'fine', 'under', 'over'): total[key] = total[key] + stats[key]
+  return total
+
+def _quantiles(total, fine_range, qs):
+  # linear interpolation within the fine histogram, with the under/overflow spread from min/max to its edges
+  import numpy as np
+  low, high = fine_range
+  n_fine = len(total['fine'])
+  edges = np.concatenate(( [min(total['min'], low)], np.linspace(low, high, n_fine + 1), [max(total['max'], high)] ))
+  cum = np.concatenate(( [0], np.cumsum(np.concatenate(( [total['under']], total['fine'], [total['over']] ))) ))
+  quantiles = {}
+  for q in qs:
+    target = q * total['n']
+    i = min(max(int(np.searchsorted(cum, target, side='right')) - 1, 0), len(edges) - 2)
+    in_bin = cum[i + 1] - cum[i]
+    frac = (target - cum[i]) / in_bin if in_bin else 0
+    quantiles[q] = float(min(max(edges[i] + frac * (edges[i + 1] - edges[i]), total['min']), total['max']))
+  return quantiles
+
+
+def monteCarlo(eq, distributions, n=1_000_000, nominals={}, limits=None, seed=None, chunk_size=100_000,
+               processes=None, quantiles=(0.00135, 0.025, 0.5, 0.975, 0.99865), bins=100, hist_range=None):
+  '''monteCarlo(eq, distributions, n=1_000_000, nominals={}, limits=None, seed=None, chunk_size=100_000,
+                processes=None, quantiles=(0.00135, 0.025, 0.5, 0.975, 0.99865), bins=100, hist_range=None)
+  Evaluates the rhs of eq (or eq itself if it's an expression) n times with its symbols sampled from
+  distributions (see the comments at the top of tolerance.py for the forms) and the rest set to their
+  value in nominals (values can be strings like '10k'). The samples are made and evaluated chunk_size
+  at a time and only their summary is kept. With processes=k (or True for one per cpu), the chunks are
+  spread over a process pool. The return is a dict of:
+    'n' (finite samples), 'n_invalid' (samples that were nan or inf), 'nominal' (eq with nominals, or
+    the middle/mean of a 'range'/'gauss' distribution for symbols not in nominals),
+    'mean', 'std', 'min', 'max', 'quantiles' {q: value} (estimated from a histogram 64x finer than
+    'hist', so to within about (max - min)/(64 * bins)), 'hist' {'counts', 'edges', 'under', 'over'}
+    and, if limits=(low, high) was passed, 'yield' (the fraction of all n samples within them).
+  The histogram range is hist_range if passed, otherwise the first chunk's range widened by 10% each way.
+  Example (a 1% divider from a 10V reference):
+    mc = monteCarlo(vdiv_out_eq, {R_IN: ('uniform', '1%'), R_GND: ('uniform', '1%')},
+                    nominals={v_in: 10, R_IN: '10k', R_GND: '10k'}, limits=(4.95, 5.05), seed=1)
+    mc['yield'], mc['quantiles'][0.5]'''
+  import numpy as np
+  from math import ceil
+  if not (n >= 1 and chunk_size >= 1):
+    raise ValueError(f'n and chunk_size must be at least 1 (got n={n}, chunk_size={chunk_size})')
+  expr = eq.rhs if isinstance(eq, sp.Equality) else sp.sympify(eq)
+  nominals = dict(nominals)
+  varied = [ symb for symb in distributions if symb in expr.free_symbols ]
+  fixed = [ symb for symb in expr.free_symbols if symb not in distributions ]
+  missing = [ symb for symb in fixed if symb not in nominals ]
+  if missing: raise ValueError(f'these symbols need a distribution or a value in nominals: {missing}')
+  fixed.sort(key=str)
+  args = varied + fixed
+  expr_srepr, args_srepr = sp.srepr(expr), sp.srepr(tuple(args))
+  dists = [ _normalizedDistribution(symb, distributions[symb], nominals) for symb in varied ]
+  fixed_vals = [ parseNum(nominals[symb]) for symb in fixed ]
+  if limits is not None: limits = tuple(parseNum(limit) for limit in limits)
+
+  n_chunks = ceil(n / chunk_size)
+  sizes = [chunk_size] * (n_chunks - 1) + [n - chunk_size * (n_chunks - 1)]
+  seed_seqs = np.random.SeedSequence(seed).spawn(n_chunks)
+  n_fine = bins * _fine_bins_per_bin
+  chunk_args = lambda i, fine_range: (expr_srepr, args_srepr, dists, fixed_vals, sizes[i], seed_seqs[i],
+                                      fine_range, n_fine, limits)
+
+  if hist_range is not None: fine_range = tuple(parseNum(val) for val in hist_range)
+  else: # the first chunk decides the range (and is then re-binned with it)
+    first = _chunkStats(*chunk_args(0, (0.0, 1.0)))
+    if not first['n']: raise ValueError('the first chunk of samples had no finite values')
+    low, high = first['min'], first['max']
+    margin = (high - low) * 0.1 or abs(low) * 1e-9 or 1e-12
+    fine_range = (low - margin, high + margin)
+
+  total = _chunkStats(*chunk_args(0, fine_range))
+  if processes and n_chunks > 1:
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=None if processes is True else processes) as pool:
+      futures = [ pool.submit(_chunkStats, *chunk_args(i, fine_range)) for i in range(1, n_chunks) ]
+      for future in futures: _mergeStats(total, future.result())
+  else:
+    for i in range(1, n_chunks): _mergeStats(total, _chunkStats(*chunk_args(i, fine_range)))
+
+  if not total['n']: raise ValueError('none of the samples had finite values')
+  fine = total['fine']
+  result = {
+    'n': total['n'], 'n_invalid': total['n_invalid'],
+    'nominal': float(_compiled(expr_srepr, args_srepr)( *[ _nominal(symb, dist, nominals)
+                                                          for symb, dist in zip(varied, dists) ], *fixed_vals )),
+    'mean': total['mean'], 'std': (total['M2'] / (total['n'] - 1))**0.5 if total['n'] > 1 else 0.0,
+    'min': total['min'], 'max': total['max'],
+    'quantiles': _quantiles(total, fine_range, quantiles),
+    'hist': { 'counts': fine.reshape(bins, _fine_bins_per_bin).sum(axis=1),
+              'edges': np.linspace(*fine_range, bins + 1), 'under': total['under'], 'over': total['over'] },
+  }
+  if limits is not None: result['yield'] = total['in_limits'] / n
+  return result
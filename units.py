@@ -31,6 +31,19 @@ metric_prefixes = {
 }
 # TODO: also this: https://stackoverflow.com/questions/31906377/sympy-and-units-for-electric-systems
 
+from math import log10 as _log10
+from re import compile as _re_compile
+
+metric_prefix_exponents = { prefix: round(_log10(mult)) for prefix, mult in metric_prefixes.items() } # i.e. 'k': 3
+
+# Compiled once and shared by getUnits, parseNum and parseMany:
+_units_delim = _re_compile(',[ ]*|[ ]+')
+# number with optional exponent, then optional metric prefix (µ and μ are micro) then optional unit letters:
+_num_with_prefix_fullmatch = _re_compile(
+  r'[ \t]*([-+]?(?:\d+\.?\d*|\.\d+))(?:[eE]([-+]?\d+))?[ \t]*(da|[qryzafpnuµμmcdhkMGTPEZYRQ])?[a-zA-ZΩ°]*[ \t]*'
+).fullmatch
+_micro_signs = ('µ', 'μ') # the micro sign and the greek mu
+
 def getUnits(*units): # NOTE: destructuring fails when only getting one unit.
   '''example: getUnits('pA nA') or getUnits('pA,nA') or getUnits('pA','nA')
   The first letter of each unit requested should be a key in metric_prefixes (or starts 
@@ -39,11 +52,11 @@ def getUnits(*units): # NOTE: destructuring fails when only getting one unit.
   the return to. if a unit is not recognized, 1 is return for that unit making this valid:
     pA, nA, A = getUnits('pA, nA, A')'''
   returns = []
-  from re import split as re_split
-  units =  [x for x in re_split(',[ ]*|[ ]+', ','.join(units)) if x.strip()] # the list compr. is to remove all-whitespace els
+  units =  [x for x in _units_delim.split(','.join(units)) if x.strip()] # the list compr. is to remove all-whitespace els
   for unit in units:
     if unit.startswith('da'): returns.append(metric_prefixes['da'])
     elif unit[0] in metric_prefixes: returns.append(metric_prefixes[unit[0]])
+    elif unit[0] in _micro_signs: returns.append(metric_prefixes['u'])
     else: returns.append(1)
   return tuple(returns)
 
@@ -117,26 +130,68 @@ def generateMetricPrefixesFor(unit_name, min='p', max='G', skip_min='c', skip_ma
 # # usage: 1.4kmv
 
 
+def _prefixExponent(prefix):
+  if not prefix: return 0
+  return metric_prefix_exponents['u' if prefix in _micro_signs else prefix]
+
+def _decimalParts(num_str):
+  # returns the mantissa (as str) and the power of ten it is multiplied by, i.e. '4.7k' -> ('4.7', 3)
+  match = _num_with_prefix_fullmatch(num_str)
+  if match is None: raise ValueError(f'could not parse {num_str!r} as a number (with optional metric prefix)')
+  mantissa, exponent, prefix = match.groups()
+  return mantissa, int(exponent or 0) + _prefixExponent(prefix)
+
 def parseNum(str_or_num, prefer_int=True):
-  '''parse an integer or float string that may have an metric unit'''
+  '''parse an integer or float string that may have an metric unit prefix and unit letters after it
+  and/or an exponent before it. Examples: '4.7k' '4.7kΩ' '100nF' '2.2µ' '1da' '1e-3' '5V' '''
   if isinstance(str_or_num, int):
     return str_or_num
   if isinstance(str_or_num, float):
     if prefer_int and str_or_num == int(str_or_num): return int(str_or_num)
     else: return str_or_num
-  temp = None
   if isinstance(str_or_num, str):
-    from re import search
-    temp = search(r'[a-zA-Z]', str_or_num)
-  if temp is not None:
-    idx = temp.start()
-    unit = str_or_num[idx]
-    # if unit == 'µ': unit = 'u' # TODO: does not work because not [a-zA-Z]
-    as_flt = float(str_or_num[:idx])
-    as_flt *= metric_prefixes[unit]
+    mantissa, exponent = _decimalParts(str_or_num)
+    as_flt = float(f'{mantissa}e{exponent}') # rather than float(mantissa) * 10**exponent, which rounds twice
   else:
     as_flt = float(str_or_num)
   as_int = int(as_flt) 
   if prefer_int and as_int == as_flt: return as_int
   else: return as_flt
 
+def _parseFloat(str_or_num):
+  if isinstance(str_or_num, str):
+    mantissa, exponent = _decimalParts(str_or_num)
+    return float(f'{mantissa}e{exponent}')
+  return float(str_or_num)
+
+def _parseFraction(str_or_num):
+  from fractions import Fraction
+  if isinstance(str_or_num, str):
+    mantissa, exponent = _decimalParts(str_or_num)
+    return Fraction(mantissa) * Fraction(10)**exponent
+  if isinstance(str_or_num, float): return Fraction(repr(str_or_num)) # the decimal, not the binary, value
+  return Fraction(str_or_num)
+
+def parseMany(values, exact=False):
+  '''parseMany(values, exact=False)
+  parses many values the way parseNum does, returning a numpy float64 array with the same shape as 
+  values (which can be any iterable or array of strings and/or numbers). With exact=True, the return 
+  is instead a numpy object array of fractions.Fraction, made from the decimal strings so there is
+  no floating point rounding at all (i.e. '0.1u' is exactly Fraction(1, 10000000)).
+  Each distinct value is only parsed once (a BOM repeats the same few hundred values many times) and
+  numeric arrays are converted without parsing at all.
+  Example:
+    parseMany(['4.7k', '100nF', '2.2µ', 1e-3, '10'])  # array([4.7e+03, 1.0e-07, 2.2e-06, 1.0e-03, 1.0e+01])'''
+  import numpy as np
+  if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf' and not exact: return values.astype(float)
+  array = values if isinstance(values, np.ndarray) else np.asarray(list(values), dtype=object)
+  flat = array.ravel().tolist()
+  parse = _parseFraction if exact else _parseFloat
+  parsed = {}
+  for value in flat:
+    if value not in parsed: parsed[value] = parse(value)
+  if exact:
+    out = np.empty(len(flat), dtype=object)
+    out[:] = [ parsed[value] for value in flat ]
+  else: out = np.fromiter(map(parsed.__getitem__, flat), dtype=float, count=len(flat))
+  return out.reshape(array.shape)